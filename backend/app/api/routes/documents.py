@@ -1,7 +1,11 @@
 from typing import List
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import json
+import os
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -9,14 +13,54 @@ from pathlib import Path
 from ...core.config import settings
 from ...core.logger import logger
 from ...models.document import Document, DocumentCreate, DocumentUpdate
+from ...models.query import BatchQueryRequest, BatchQueryResponse, QueryRequest
+from ...services.admission import AdmissionRejected, Priority, SingleFlight, admission_controller
 from ...services.document_loader import DocumentLoader
-from ...services.rag_pipeline import RAGPipeline
+from ...services.events import progress_bus
+from ...services.rag_pipeline import get_rag_pipeline
 from ...core.security import verify_token
 from ...db.session import get_db
 
 router = APIRouter()
 document_loader = DocumentLoader()
-rag_pipeline = RAGPipeline()
+rag_pipeline = get_rag_pipeline()
+query_flight = SingleFlight()
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that holds an admission slot until it ends.
+    
+    The slot is acquired before the response is built, so a rejection is a
+    plain 429. It is released exactly once when the response finishes, even if
+    the client disconnects before the body starts and the generator never runs.
+    """
+    
+    def __init__(self, content, user_id: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self.user_id = user_id
+        self._released = False
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            admission_controller.release(self.user_id)
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def _ingest_progress(user_id: str, doc_id: str):
+    """Progress callback that forwards ingest stages to the user's WebSocket connections."""
+    def report(stage: str, count: int, total: int):
+        progress_bus.publish(user_id, {
+            "type": "ingest",
+            "doc_id": doc_id,
+            "stage": stage,
+            "count": count,
+            "total": total
+        })
+    return report
 
 @router.post("/upload/")
 async def upload_document(
@@ -25,6 +69,7 @@ async def upload_document(
     db: Session = Depends(get_db)
 ):
     """Upload and process a document."""
+    doc_id = str(uuid.uuid4())
     try:
         # Validate file type
         file_ext = file.filename.lower().split(".")[-1]
@@ -32,7 +77,6 @@ async def upload_document(
             raise HTTPException(status_code=400, detail="Unsupported file type")
         
         # Create document record
-        doc_id = str(uuid.uuid4())
         document = Document(
             id=doc_id,
             title=file.filename,
@@ -43,38 +87,53 @@ async def upload_document(
             size_bytes=0  # Will be updated after saving
         )
         
-        # Save file
-        file_path = settings.UPLOAD_DIR / f"{doc_id}.{file_ext}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-            document.size_bytes = len(content)
-        
-        # Process document
-        chunks = await document_loader.load_document(file_path)
-        
-        # Store chunks in vector store
-        chunk_ids = await rag_pipeline.process_document(
-            file_path,
-            metadata={
-                "doc_id": doc_id,
-                "title": document.title,
-                "file_type": document.file_type
-            }
-        )
-        
-        # Update document with chunk IDs
-        document.chunk_ids = chunk_ids
-        document.processed = True
-        
-        # Save to database
-        db.add(document)
-        db.commit()
+        # Ingest is bulk work: it yields to interactive queries under load
+        async with admission_controller.admit(user_id, Priority.BULK):
+            # Save file in blocks rather than reading it into memory
+            file_path = settings.UPLOAD_DIR / f"{doc_id}.{file_ext}"
+            with open(file_path, "wb") as f:
+                while block := await file.read(1024 * 1024):
+                    f.write(block)
+                    document.size_bytes += len(block)
+            
+            # Process document
+            progress = _ingest_progress(user_id, doc_id)
+            chunks = await document_loader.load_document(file_path)
+            if isinstance(chunks, list):  # Text and source files are parsed while indexing
+                progress("parsed", len(chunks), len(chunks))
+            
+            def commit(chunk_ids: List[str]):
+                # Runs under the pipeline write lock, so snapshots see the row with its chunks.
+                # Chunk ids live in the chunk store; the document row only keeps the count
+                document.num_chunks = len(chunk_ids)
+                document.processed = True
+                db.add(document)
+                try:
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+            
+            # Store chunks in vector store, then save to database
+            await rag_pipeline.process_document(
+                file_path,
+                metadata={
+                    "doc_id": doc_id,
+                    "title": document.title,
+                    "file_type": document.file_type
+                },
+                chunks=chunks,
+                progress=progress,
+                commit=commit
+            )
         
         return {"message": "Document uploaded and processed successfully", "document_id": doc_id}
         
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         logger.error(f"Error processing upload: {str(e)}")
+        progress_bus.publish(user_id, {"type": "ingest", "doc_id": doc_id, "stage": "failed", "error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/query/")
@@ -85,14 +144,100 @@ async def query_documents(
     db: Session = Depends(get_db)
 ):
     """Query documents using RAG."""
+    # Identical in-flight queries share one retrieval and one generation; each
+    # caller is still admitted on its own, so a follower never waits in or is
+    # rejected by another user's queue
+    key = hashlib.sha256(f"{query}\0{image_data or ''}".encode("utf-8")).hexdigest()
+    
     try:
-        response = await rag_pipeline.query(query, image_data)
+        async with admission_controller.admit(user_id, Priority.INTERACTIVE):
+            response = await query_flight.do(key, lambda: rag_pipeline.query(query, image_data))
         return response
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query/stream/")
+async def stream_query_documents(
+    request: QueryRequest,
+    user_id: str = Depends(verify_token)
+):
+    """Query documents, streaming the answer as NDJSON events.
+    
+    Lines are ``{"type": "token", "text": ...}`` events followed by one
+    ``{"type": "done", "sources": [...]}`` event, or a ``{"type": "error"}`` line.
+    """
+    # Admitted before responding so a rejection is a plain 429; the response
+    # releases the slot when it ends
+    await admission_controller.acquire(user_id, Priority.INTERACTIVE)
+    
+    async def stream_events():
+        try:
+            async for event in rag_pipeline.stream_query(request.query, request.image_data):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        finally:
+            response.release()
+    
+    response = AdmittedStreamingResponse(stream_events(), user_id, media_type="application/x-ndjson")
+    return response
+
+@router.post("/query/batch/", response_model=BatchQueryResponse)
+async def batch_query_documents(
+    request: BatchQueryRequest,
+    user_id: str = Depends(verify_token)
+):
+    """Answer many queries with one embedding pass and one vector search.
+    
+    With ``stream`` set, results are sent as NDJSON lines in completion order;
+    each line carries the ``index`` of its query. If the batch as a whole fails,
+    the stream ends with an ``{"error": ...}`` line without an index.
+    """
+    if len(request.queries) > settings.BATCH_QUERY_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_QUERY_MAX_SIZE} queries per batch"
+        )
+    
+    max_concurrency = min(
+        request.max_concurrency or settings.BATCH_QUERY_MAX_CONCURRENCY,
+        settings.BATCH_QUERY_MAX_CONCURRENCY
+    )
+    
+    if request.stream:
+        # Admitted before responding so a rejection is a plain 429; the response
+        # releases the slot when it ends
+        await admission_controller.acquire(user_id, Priority.BULK)
+        
+        async def stream_results():
+            try:
+                async for _, result in rag_pipeline.iter_batch_query(request.queries, max_concurrency):
+                    yield json.dumps(result) + "\n"
+            except Exception as e:
+                logger.error(f"Error streaming batch query: {str(e)}")
+                yield json.dumps({"error": str(e)}) + "\n"
+            finally:
+                response.release()
+        
+        response = AdmittedStreamingResponse(stream_results(), user_id, media_type="application/x-ndjson")
+        return response
+    
+    try:
+        async with admission_controller.admit(user_id, Priority.BULK):
+            results = await rag_pipeline.batch_query(request.queries, max_concurrency)
+        return {"results": results}
+        
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing batch query: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/documents/", response_model=List[Document])
 async def get_documents(
     user_id: str = Depends(verify_token),
@@ -119,6 +264,106 @@ async def get_document(
     
     return document
 
+@router.put("/documents/{document_id}")
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    user_id: str = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """Replace a document with a new version, re-indexing only changed chunks."""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == user_id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Validate file type
+    file_ext = file.filename.lower().split(".")[-1]
+    if f".{file_ext}" not in settings.SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    
+    # The new version is staged next to the old one and only swapped in once indexed
+    old_path = Path(document.file_path)
+    file_path = settings.UPLOAD_DIR / f"{document_id}.{file_ext}"
+    staged_path = settings.UPLOAD_DIR / f".{document_id}-{uuid.uuid4().hex}.{file_ext}"
+    try:
+        async with admission_controller.admit(user_id, Priority.BULK):
+            size_bytes = 0
+            with open(staged_path, "wb") as f:
+                while block := await file.read(1024 * 1024):
+                    f.write(block)
+                    size_bytes += len(block)
+            
+            # Re-parse and diff against the stored chunks
+            progress = _ingest_progress(user_id, document_id)
+            chunks = await document_loader.load_document(staged_path)
+            if isinstance(chunks, list):  # Text and source files are parsed while indexing
+                progress("parsed", len(chunks), len(chunks))
+            
+            def commit(chunk_ids: List[str]):
+                # Runs under the pipeline write lock once the new chunks are stored, before
+                # the old ones are dropped; raising here keeps the previous version whole
+                previous = {
+                    field: getattr(document, field)
+                    for field in ("title", "file_path", "file_type", "size_bytes", "num_chunks")
+                }
+                
+                # Update document in place, keeping its id
+                document.title = file.filename
+                document.file_path = f"{settings.UPLOAD_DIR}/{document_id}.{file_ext}"
+                document.file_type = file_ext
+                document.size_bytes = size_bytes
+                document.num_chunks = len(chunk_ids)
+                document.processed = True
+                try:
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                
+                # The old file is only overwritten once the row points at the new version
+                try:
+                    os.replace(staged_path, file_path)
+                except OSError:
+                    for field, value in previous.items():
+                        setattr(document, field, value)
+                    db.commit()
+                    raise
+            
+            result = await rag_pipeline.update_document(
+                chunks,
+                metadata={
+                    "doc_id": document_id,
+                    "title": file.filename,
+                    "file_type": file_ext
+                },
+                progress=progress,
+                commit=commit
+            )
+        
+        if old_path.exists() and old_path.resolve() != file_path.resolve():
+            old_path.unlink()
+        
+        return {
+            "message": "Document replaced successfully",
+            "document_id": document_id,
+            "chunks_reused": result["chunks_reused"],
+            "chunks_added": result["chunks_added"],
+            "chunks_removed": result["chunks_removed"]
+        }
+        
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error replacing document {document_id}: {str(e)}")
+        progress_bus.publish(user_id, {"type": "ingest", "doc_id": document_id, "stage": "failed", "error": str(e)})
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        staged_path.unlink(missing_ok=True)
+
 @router.delete("/documents/{document_id}")
 async def delete_document(
     document_id: str,
@@ -139,8 +384,16 @@ async def delete_document(
     if file_path.exists():
         file_path.unlink()
     
-    # Delete from database
-    db.delete(document)
-    db.commit()
+    def commit(chunk_ids: List[str]):
+        # Runs under the pipeline write lock, so snapshots never see the row without its chunks
+        db.delete(document)
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    
+    # Delete chunks and vectors, then the row, off the event loop (may wait for a snapshot)
+    await asyncio.to_thread(rag_pipeline.delete_document, document_id, commit)
     
     return {"message": "Document deleted successfully"}
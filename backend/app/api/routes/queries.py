@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from ...core.logger import logger
+from ...core.security import verify_token
+from ...models.query import ChatRequest, ChatResponse, ConversationInfo
+from ...services.admission import AdmissionRejected, Priority, admission_controller
+from ...services.conversation import ConversationStore
+from ...services.rag_pipeline import get_rag_pipeline
+
+router = APIRouter()
+conversation_store = ConversationStore()
+rag_pipeline = get_rag_pipeline()
+
+@router.post("/sessions/")
+async def create_session(user_id: str = Depends(verify_token)):
+    """Start a new conversation session."""
+    session = conversation_store.create(user_id)
+    return {"session_id": session.id}
+
+@router.post("/sessions/{session_id}/messages", response_model=ChatResponse)
+async def send_message(
+    session_id: str,
+    request: ChatRequest,
+    user_id: str = Depends(verify_token)
+):
+    """Ask a question within a conversation session."""
+    session = conversation_store.get(session_id, user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    try:
+        # Turns in one session are serialized so history stays ordered
+        async with session.lock, admission_controller.admit(user_id, Priority.INTERACTIVE):
+            return await rag_pipeline.chat(session, request.question)
+        
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing message: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sessions/{session_id}", response_model=ConversationInfo)
+async def get_session(
+    session_id: str,
+    user_id: str = Depends(verify_token)
+):
+    """Get the history, pinned context and token usage of a session."""
+    session = conversation_store.get(session_id, user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {
+        "session_id": session.id,
+        "created_at": session.created_at,
+        "history": session.history,
+        "context_ids": session.context_ids,
+        "usage": session.usage
+    }
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    user_id: str = Depends(verify_token)
+):
+    """End a conversation session."""
+    if not conversation_store.delete(session_id, user_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {"message": "Session deleted successfully"}
@@ -0,0 +1,169 @@
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+import time
+
+from ...core.config import settings
+from ...core.logger import logger
+from ...core.security import verify_token
+from ...services.admission import AdmissionRejected, Priority, admission_controller
+from ...services.events import progress_bus
+from ...services.rag_pipeline import get_rag_pipeline
+
+router = APIRouter()
+rag_pipeline = get_rag_pipeline()
+
+
+class SlowConsumer(Exception):
+    """The client stopped reading and the send queue stayed full."""
+
+
+class RealtimeConnection:
+    """One multiplexed WebSocket connection.
+
+    Client messages::
+
+        {"type": "query", "id": "q1", "query": "...", "image_data": null}
+        {"type": "cancel", "id": "q1"}
+        {"type": "pong"}
+
+    Server messages are ``ingest`` progress events, ``token``/``done``/``error``
+    events tagged with the query ``id``, and periodic ``ping`` heartbeats.
+
+    All outgoing messages go through one bounded queue drained by a single
+    sender task. Progress events are buffered per subscription and coalesced
+    per document when the client falls behind, always keeping each document's
+    final ``indexed`` or ``failed`` event; answer tokens wait for queue space, and a
+    client that stays blocked longer than ``WS_SEND_TIMEOUT_SECONDS`` is
+    disconnected.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.outbound: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.streams: Dict[str, asyncio.Task] = {}
+        self.last_seen = time.monotonic()
+
+    async def send(self, message: Dict[str, Any]):
+        try:
+            await asyncio.wait_for(self.outbound.put(message), settings.WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise SlowConsumer()
+
+    async def run(self):
+        subscription = progress_bus.subscribe(self.user_id)
+        tasks = [
+            asyncio.create_task(self._sender()),
+            asyncio.create_task(self._receiver()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._forward_progress(subscription)),
+        ]
+        try:
+            # Whichever task ends first (disconnect, timeout, slow client) closes the connection
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    exc = task.exception()
+                    if not isinstance(exc, (WebSocketDisconnect, SlowConsumer)):
+                        logger.error(f"WebSocket error for user {self.user_id}: {str(exc)}")
+        finally:
+            progress_bus.unsubscribe(self.user_id, subscription)
+            for task in tasks + list(self.streams.values()):
+                task.cancel()
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+
+    async def _sender(self):
+        while True:
+            message = await self.outbound.get()
+            await self.websocket.send_json(message)
+
+    async def _receiver(self):
+        while True:
+            raw = await self.websocket.receive_text()
+            self.last_seen = time.monotonic()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                # A bad frame is the client's problem, not a reason to drop every stream
+                await self.send({"type": "error", "error": "Messages must be JSON objects"})
+                continue
+            message_type = message.get("type")
+
+            if message_type == "query":
+                await self._start_query(message)
+            elif message_type == "cancel":
+                task = self.streams.pop(str(message.get("id")), None)
+                if task:
+                    task.cancel()
+            elif message_type != "pong":
+                await self.send({"type": "error", "error": f"Unknown message type: {message_type}"})
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_SECONDS)
+            if time.monotonic() - self.last_seen > settings.WS_HEARTBEAT_TIMEOUT_SECONDS:
+                logger.info(f"WebSocket heartbeat timeout for user {self.user_id}")
+                return
+            await self.send({"type": "ping", "time": time.time()})
+
+    async def _forward_progress(self, subscription):
+        while True:
+            event = await subscription.get()
+            await self.send(event)
+
+    async def _start_query(self, message: Dict[str, Any]):
+        query_id = str(message.get("id", ""))
+        query = message.get("query")
+        if not query_id or not query:
+            await self.send({"type": "error", "id": query_id, "error": "Queries need an id and a query"})
+            return
+        if query_id in self.streams:
+            await self.send({"type": "error", "id": query_id, "error": "Query id already in use"})
+            return
+        if len(self.streams) >= settings.WS_MAX_STREAMS_PER_CONNECTION:
+            await self.send({"type": "error", "id": query_id, "error": "Too many concurrent queries"})
+            return
+
+        task = asyncio.create_task(self._stream_answer(query_id, query, message.get("image_data")))
+        self.streams[query_id] = task
+        task.add_done_callback(lambda done: self._forget_stream(query_id, done))
+
+    def _forget_stream(self, query_id: str, task: asyncio.Task):
+        if self.streams.get(query_id) is task:
+            del self.streams[query_id]
+
+    async def _stream_answer(self, query_id: str, query: str, image_data: Optional[str]):
+        try:
+            async with admission_controller.admit(self.user_id, Priority.INTERACTIVE):
+                async for event in rag_pipeline.stream_query(query, image_data):
+                    await self.send({"id": query_id, **event})
+        except AdmissionRejected as e:
+            await self.send({"type": "error", "id": query_id, "error": e.reason, "retry_after": e.retry_after})
+        except asyncio.CancelledError:
+            raise
+        except SlowConsumer:
+            # Closing makes the receiver fail, which tears the connection down
+            logger.warning(f"Closing slow WebSocket consumer for user {self.user_id}")
+            await self.websocket.close(code=1013)
+        except Exception as e:
+            logger.error(f"Error streaming query {query_id}: {str(e)}")
+            await self.send({"type": "error", "id": query_id, "error": str(e)})
+
+
+@router.websocket("/")
+async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
+    """Multiplexed channel for ingest progress and streamed answers."""
+    user_id = verify_token(token)
+    if not user_id:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    await RealtimeConnection(websocket, user_id).run()
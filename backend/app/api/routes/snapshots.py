@@ -0,0 +1,40 @@
+from pathlib import Path
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from ...core.config import settings
+from ...core.logger import logger
+from ...core.security import verify_token
+from ...services.rag_pipeline import get_rag_pipeline
+from ...services.snapshot import create_snapshot, read_manifest
+
+router = APIRouter()
+rag_pipeline = get_rag_pipeline()
+
+def _require_admin(user_id: str):
+    if user_id not in settings.SNAPSHOT_ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Not allowed to manage snapshots")
+
+@router.post("/")
+async def take_snapshot(compress: bool = False, user_id: str = Depends(verify_token)):
+    """Take a point-in-time snapshot; ingest pauses briefly, queries keep running."""
+    _require_admin(user_id)
+    try:
+        archive_path = await asyncio.to_thread(create_snapshot, rag_pipeline, None, compress)
+        manifest = read_manifest(archive_path)
+        return {"archive": archive_path.name, "created_at": manifest["created_at"], "counts": manifest["counts"]}
+        
+    except Exception as e:
+        logger.error(f"Error taking snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/")
+async def list_snapshots(user_id: str = Depends(verify_token)):
+    """List snapshot archives on this node, newest first."""
+    _require_admin(user_id)
+    archives = sorted(Path(settings.SNAPSHOT_DIR).glob("snapshot-*.tar*"), reverse=True)
+    return [
+        {"archive": archive.name, "size": archive.stat().st_size}
+        for archive in archives if not archive.name.endswith(".tmp")
+    ]
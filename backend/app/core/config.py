@@ -15,20 +15,79 @@ class Settings(BaseSettings):
     
     # Claude API
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
-    CLAUDE_MODEL: str = "claude-3-sonnet-20240229"
+    CLAUDE_MODEL: str = "claude-3-5-sonnet-20241022"  # Must support prompt caching (conversation sessions)
+    
+    # Batch queries
+    BATCH_QUERY_MAX_SIZE: int = 500
+    BATCH_QUERY_MAX_CONCURRENCY: int = 8  # Concurrent Claude calls per batch
+    
+    # Admission control (per worker process)
+    ADMISSION_MAX_CONCURRENT: int = 16
+    ADMISSION_MAX_PER_USER: int = 4
+    ADMISSION_MAX_QUEUE: int = 64  # Requests beyond this are rejected with 429
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    
+    # Conversation sessions
+    SESSION_TTL_SECONDS: int = 60 * 60  # Idle sessions expire after 1 hour
+    SESSION_MAX_SESSIONS: int = 1000
+    SESSION_MAX_HISTORY_TURNS: int = 10
+    SESSION_MAX_CONTEXT_CHUNKS: int = 20
+    SESSION_CONTEXT_REUSE_OVERLAP: float = 0.4  # Share of a retrieval already pinned to reuse it
     
     # Database
     SQLITE_URL: str = "sqlite:///./notebook_llm.db"
     
     # Vector Store
+    VECTOR_STORE_BACKEND: str = "chroma"  # "chroma" or "faiss"
     VECTOR_STORE_PATH: str = "./data/chroma"
+    FAISS_INDEX_PATH: str = "./data/faiss"
+    FAISS_INDEX_TYPE: str = "ivfpq"  # flat, hnsw, sq8, ivfpq, ivfsq8
+    FAISS_NLIST: int = 4096  # IVF cells
+    FAISS_PQ_M: int = 64  # PQ sub-quantizers; 1024 dims -> 16 dims each
+    FAISS_PQ_BITS: int = 8
+    FAISS_HNSW_M: int = 32
+    FAISS_NPROBE: int = 32  # IVF cells scanned per query
+    FAISS_EF_SEARCH: int = 128  # HNSW search breadth
+    FAISS_RERANK_FACTOR: int = 4  # k * factor candidates are re-scored exactly
+    FAISS_TRAIN_MIN_VECTORS: int = 100_000  # Serve exactly until this many vectors exist
+    FAISS_MMAP_INDEX: bool = False  # Memory-map the index on open (fast warm start, loaded on first write)
+    FAISS_CHECKPOINT_EVERY: int = 50_000  # Logged vector adds/deletes between index checkpoints
+    FAISS_MAX_TOMBSTONE_RATIO: float = 0.1  # Rebuild the index and raw vectors once deleted vectors exceed this share
     EMBEDDING_MODEL: str = "BAAI/bge-large-en-v1.5"
+    EMBEDDING_DIM: int = 1024
+    CHUNK_STORE_PATH: str = "./data/chunks"
+    CHUNK_STORE_COMPACTION_FANIN: int = 8  # Shards of one size tier merged together
+    
+    # Snapshots
+    SNAPSHOT_DIR: str = "./data/snapshots"
+    SNAPSHOT_RESTORE_PATH: Optional[str] = None  # Archive or directory restored on startup when empty
+    SNAPSHOT_ADMIN_USERS: set = set()  # User ids allowed to take snapshots over the API
+    
+    # Embedding backend: "local" loads the model in every worker, "server" uses
+    # the shared embedding server (python -m app.services.embedding_server)
+    EMBEDDING_BACKEND: str = "local"
+    EMBEDDING_SERVER_SOCKET: Optional[str] = "/tmp/notebook_llm_embeddings.sock"  # Empty to use TCP
+    EMBEDDING_SERVER_HOST: str = "127.0.0.1"
+    EMBEDDING_SERVER_PORT: int = 8765
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_WAIT_MS: int = 10
     
     # File Storage
     UPLOAD_DIR: Path = Path("./data/uploads")
     PROCESSED_DIR: Path = Path("./data/processed")
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50MB
     
+    # Image preprocessing
+    IMAGE_MAX_EDGE: int = 1568  # Larger images are downscaled by Claude anyway
+    IMAGE_MAX_PIXELS: int = 1_150_000
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_CACHE_SIZE: int = 256  # Prepared images kept in memory, by content hash
+    OCR_WORKERS: int = 4
+    
+    # Text and source code loading
+    TEXT_CHUNK_SIZE: int = 2000  # Characters; ~512 embedding tokens
+    SOURCE_PARSE_CACHE_SIZE: int = 1024  # Python span lists kept in memory, by file hash
+    
     # Supported File Types
     SUPPORTED_EXTENSIONS: set = {
         # Documents
@@ -47,6 +106,12 @@ class Settings(BaseSettings):
     
     # Real-time
     ENABLE_WEBSOCKET: bool = True
+    WS_HEARTBEAT_SECONDS: float = 20.0
+    WS_HEARTBEAT_TIMEOUT_SECONDS: float = 60.0  # Close if the client sends nothing for this long
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0  # Close clients that stop reading
+    WS_PROGRESS_BUFFER_SIZE: int = 64  # Pending progress events per connection, one per document; indexed/failed are always kept
+    WS_MAX_STREAMS_PER_CONNECTION: int = 4
     FIREBASE_CREDENTIALS: Optional[Dict[str, Any]] = None
     
     class Config:
@@ -58,5 +123,6 @@ settings = Settings()
 settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 settings.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
-# Ensure vector store directory exists
+# Ensure vector store directories exist
 Path(settings.VECTOR_STORE_PATH).mkdir(parents=True, exist_ok=True)
+Path(settings.CHUNK_STORE_PATH).mkdir(parents=True, exist_ok=True)
@@ -5,8 +5,14 @@ import uvicorn
 
 from .core.config import settings
 from .core.logger import logger
-from .api.routes import documents, auth, queries, summaries
+from .services.snapshot import warm_start
+
+# Restore a snapshot on a fresh replica before any route opens the stores
+warm_start()
+
+from .api.routes import documents, auth, queries, summaries, realtime, snapshots
 from .db.session import Base, engine
+from .services.admission import AdmissionRejected, admission_controller
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -52,13 +58,39 @@ app.include_router(
     tags=["Summaries"]
 )
 
+app.include_router(
+    snapshots.router,
+    prefix=f"{settings.API_V1_STR}/snapshots",
+    tags=["Snapshots"]
+)
+
+if settings.ENABLE_WEBSOCKET:
+    app.include_router(
+        realtime.router,
+        prefix=f"{settings.API_V1_STR}/ws",
+        tags=["Realtime"]
+    )
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.on_event("shutdown")
+def persist_vector_store():
+    # The operation log covers writes since the last checkpoint; this only shortens replay on start
+    documents.rag_pipeline.vector_store.persist()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Notebook LLM API"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "admission": admission_controller.stats()}
 
 if __name__ == "__main__":
     uvicorn.run(
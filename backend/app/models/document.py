@@ -25,7 +25,7 @@ class Document(BaseModel):
     size_bytes: int
     num_pages: Optional[int] = None
     processed: bool = False
-    chunk_ids: list[str] = Field(default_factory=list)
+    num_chunks: int = 0
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 class DocumentCreate(BaseModel):
@@ -38,4 +38,4 @@ class DocumentUpdate(BaseModel):
     title: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
     processed: Optional[bool] = None
-    chunk_ids: Optional[list[str]] = None
+    num_chunks: Optional[int] = None
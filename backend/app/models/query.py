@@ -0,0 +1,45 @@
+from typing import Optional, List, Dict
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+class QueryRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    image_data: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    stream: bool = False
+
+class QueryResult(BaseModel):
+    index: int
+    query: str
+    answer: Optional[str] = None
+    sources: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[QueryResult]
+
+class ChatRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+
+class TokenUsage(BaseModel):
+    input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    output_tokens: int = 0
+
+class ChatResponse(BaseModel):
+    answer: str
+    sources: List[str] = Field(default_factory=list)
+    context_reused: bool = False
+    new_chunks: int = 0
+    usage: TokenUsage
+
+class ConversationInfo(BaseModel):
+    session_id: str
+    created_at: datetime
+    history: List[Dict[str, str]] = Field(default_factory=list)
+    context_ids: List[str] = Field(default_factory=list)
+    usage: TokenUsage
@@ -0,0 +1,165 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from enum import IntEnum
+import asyncio
+import heapq
+import itertools
+import math
+
+from ..core.config import settings
+from ..core.logger import logger
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; mapped to HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global and per-user concurrency limits with a bounded priority queue.
+
+    Requests that cannot start immediately wait in a priority queue (interactive
+    before bulk, FIFO within a priority). A full queue or a wait longer than the
+    queue timeout rejects the request instead of letting work pile up.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_per_user: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        self.max_concurrent = max_concurrent or settings.ADMISSION_MAX_CONCURRENT
+        self.max_per_user = max_per_user or settings.ADMISSION_MAX_PER_USER
+        self.max_queue = max_queue or settings.ADMISSION_MAX_QUEUE
+        self.queue_timeout = queue_timeout or settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        self._active = 0
+        self._active_by_user: Dict[str, int] = defaultdict(int)
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def retry_after(self) -> int:
+        return math.ceil(self.queue_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+    async def acquire(self, user_id: str, priority: Priority = Priority.INTERACTIVE):
+        """Wait for a slot; every successful call must be paired with ``release``."""
+        # Free capacity means every queued waiter is blocked on its own per-user limit
+        if self._can_run(user_id):
+            self._grant(user_id)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("Server busy, queue is full", self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._sequence), user_id, future)
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up: hand the slot back
+                self.release(user_id)
+            else:
+                self._remove_waiter(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning(f"Admission timed out for user {user_id} ({priority.name})")
+                raise AdmissionRejected("Server busy, timed out waiting in queue", self.retry_after)
+            raise
+
+    def release(self, user_id: str):
+        self._active -= 1
+        self._active_by_user[user_id] -= 1
+        if not self._active_by_user[user_id]:
+            del self._active_by_user[user_id]
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: Priority = Priority.INTERACTIVE):
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def _can_run(self, user_id: str) -> bool:
+        return (
+            self._active < self.max_concurrent
+            and self._active_by_user[user_id] < self.max_per_user
+        )
+
+    def _grant(self, user_id: str):
+        self._active += 1
+        self._active_by_user[user_id] += 1
+
+    def _dispatch(self):
+        """Start queued requests in priority order, skipping users at their limit."""
+        blocked = []
+        while self._waiters and self._active < self.max_concurrent:
+            entry = heapq.heappop(self._waiters)
+            _, _, user_id, future = entry
+            if future.done():
+                continue
+            if self._active_by_user[user_id] >= self.max_per_user:
+                blocked.append(entry)
+                continue
+            self._grant(user_id)
+            future.set_result(None)
+
+        for entry in blocked:
+            heapq.heappush(self._waiters, entry)
+
+    def _remove_waiter(self, entry: Tuple[int, int, str, asyncio.Future]):
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls so they share one execution.
+
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same result. The shared task is shielded so one caller
+    disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,496 @@
+"""Columnar chunk store.
+
+Chunk text and per-chunk attributes live in append-only Arrow IPC shards that
+are memory-mapped for zero-copy reads; document-level attributes (title, file
+type) are stored once per document instead of once per chunk. The vector index
+only keeps chunk ids and vectors and retrieval hydrates just the columns it
+needs from here.
+
+Several processes (uvicorn workers) can share one store. Writes take an
+exclusive file lock, and every manifest entry carries a sequence number, so a
+process that sees the manifest change on disk replays only the entries (and
+merges) it has not applied yet before reading.
+
+Shards are merged size-tiered in a background thread: once ``fanin`` shards of
+similar size exist they are rewritten into one, so each row is rewritten about
+log_fanin(N) times and no write ever rewrites the corpus. The merged shard is
+written without any lock held; only the manifest switch takes the lock.
+
+Layout under ``CHUNK_STORE_PATH``::
+
+    manifest.json        # shard/delete log and recent merges
+    documents.json       # doc_id -> document attributes
+    shard-000001.arrow   # one shard per write or merge
+    .lock                # writer lock
+"""
+from typing import List, Dict, Any, Optional, Iterable, Sequence, Tuple
+from pathlib import Path
+import json
+import math
+import os
+import threading
+import uuid
+import pyarrow as pa
+
+from ..core.config import settings
+from ..core.logger import logger
+from ..models.document import DocumentChunk
+from .locks import InterProcessLock, file_stamp
+
+MANIFEST_VERSION = 1
+MERGE_HISTORY = 1000  # Merges kept in the manifest for processes catching up
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("doc_id", pa.dictionary(pa.int32(), pa.string())),
+    ("chunk_key", pa.string()),
+    ("chunk_type", pa.dictionary(pa.int8(), pa.string())),
+    ("page_num", pa.int32()),
+    ("text", pa.large_string()),
+    # Where the chunk sits in a text or source file; null for other formats
+    ("line_start", pa.int32()),
+    ("line_end", pa.int32()),
+    ("kind", pa.dictionary(pa.int8(), pa.string())),
+    ("name", pa.string()),
+])
+
+# Columns filled from ``DocumentChunk.metadata``
+SOURCE_COLUMNS = ("line_start", "line_end", "kind", "name")
+
+
+def _write_json(path: Path, payload: Any):
+    """Write JSON atomically so readers never see a partial file."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _write_shard(path: Path, table: Optional[pa.Table]):
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            if table is not None:
+                writer.write_table(table)
+
+
+class ChunkStore:
+    def __init__(self, path: Optional[str] = None, compaction_fanin: Optional[int] = None):
+        self.path = Path(path or settings.CHUNK_STORE_PATH)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.compaction_fanin = max(2, compaction_fanin or settings.CHUNK_STORE_COMPACTION_FANIN)
+        self._file_lock = InterProcessLock(self.path / ".lock")  # Writers, across processes
+        self._lock = threading.RLock()  # In-memory state
+        self._tables: Dict[str, pa.Table] = {}
+        self._locations: Dict[str, Tuple[str, int]] = {}  # chunk id -> (shard, row)
+        self._by_document: Dict[str, set] = {}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._store_id: Optional[str] = None
+        self._log: List[Dict[str, Any]] = []
+        self._merges: List[Dict[str, Any]] = []
+        self._next_shard = 1
+        self._next_seq = 1
+        self._applied_seq = 0
+        self._floor = 0  # Processes behind this sequence number reload fully
+        self._manifest_stamp = None
+        self._documents_stamp = None
+        self._compactor: Optional[threading.Thread] = None
+        with self._file_lock:
+            self._sync()
+
+    # -- Reads ---------------------------------------------------------------
+
+    def get(
+        self,
+        chunk_ids: Sequence[str],
+        columns: Iterable[str] = ("doc_id", "page_num", "chunk_type", "text"),
+        document_fields: Iterable[str] = ()
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Hydrate the requested columns for ``chunk_ids``, in order.
+
+        Unknown ids come back as ``None``. Only the requested columns of the
+        shards involved are touched, so unread text is never paged in.
+        """
+        columns = list(columns)
+        document_fields = list(document_fields)
+        self._refresh()
+        with self._lock:
+            results: List[Optional[Dict[str, Any]]] = [None] * len(chunk_ids)
+            by_shard: Dict[str, List[Tuple[int, int]]] = {}
+            for position, chunk_id in enumerate(chunk_ids):
+                location = self._locations.get(chunk_id)
+                if location is not None:
+                    by_shard.setdefault(location[0], []).append((position, location[1]))
+
+            for shard, hits in by_shard.items():
+                rows = pa.array([row for _, row in hits], type=pa.int64())
+                values = {
+                    column: self._tables[shard].column(column).take(rows).to_pylist()
+                    for column in set(columns) | ({"doc_id"} if document_fields else set())
+                }
+                for i, (position, _) in enumerate(hits):
+                    record = {"id": chunk_ids[position]}
+                    record.update({column: values[column][i] for column in columns})
+                    if document_fields:
+                        attributes = self._documents.get(values["doc_id"][i], {})
+                        record.update({field: attributes.get(field) for field in document_fields})
+                    results[position] = record
+            return results
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            return self._documents.get(doc_id)
+
+    def document_chunk_ids(self, doc_id: str) -> List[str]:
+        self._refresh()
+        with self._lock:
+            return list(self._by_document.get(doc_id, ()))
+
+    def __contains__(self, chunk_id: str) -> bool:
+        self._refresh()
+        return chunk_id in self._locations
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._locations)
+
+    def document_count(self) -> int:
+        self._refresh()
+        with self._lock:
+            return len(self._documents)
+
+    def locked(self) -> InterProcessLock:
+        """Lock excluding writes and merges from every process; hold it while using ``snapshot_files``."""
+        return self._file_lock
+
+    def snapshot_files(self) -> List["SnapshotFile"]:
+        """Files making up the current state; all of them are immutable or replaced atomically."""
+        from .snapshot import SnapshotFile
+
+        with self._file_lock:
+            self._sync()
+            names = [name for name in ("manifest.json", "documents.json") if (self.path / name).exists()]
+            shards = [entry["add"] for entry in self._log if "add" in entry]
+            return [SnapshotFile(name, self.path / name, immutable=True) for name in names + shards]
+
+    # -- Writes --------------------------------------------------------------
+
+    def put_document(self, doc_id: str, attributes: Dict[str, Any]):
+        """Store document-level attributes once for all of its chunks."""
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                self._documents[doc_id] = dict(attributes)
+                self._save_documents()
+
+    def add(self, doc_id: str, chunk_ids: List[str], keys: List[str], chunks: List[DocumentChunk]):
+        """Write chunks to a new shard; existing ids are superseded."""
+        if not chunks:
+            return
+        table = pa.table({
+            "id": chunk_ids,
+            "doc_id": pa.array([doc_id] * len(chunks)).dictionary_encode(),
+            "chunk_key": keys,
+            "chunk_type": pa.array([chunk.chunk_type.value for chunk in chunks]).dictionary_encode(),
+            "page_num": pa.array([chunk.page_num or 0 for chunk in chunks], type=pa.int32()),
+            "text": pa.array([chunk.text for chunk in chunks], type=pa.large_string()),
+            **{
+                column: pa.array([chunk.metadata.get(column) for chunk in chunks], type=SCHEMA.field(column).type)
+                for column in ("line_start", "line_end", "name")
+            },
+            "kind": pa.array([chunk.metadata.get("kind") for chunk in chunks], type=pa.string()).dictionary_encode(),
+        }, schema=SCHEMA)
+
+        with self._file_lock:
+            self._sync()
+            shard = f"shard-{self._next_shard:06d}.arrow"
+            _write_shard(self.path / shard, table)
+            with self._lock:
+                self._next_shard += 1
+                self._append({"add": shard})
+                self._apply_add(shard)
+        self._schedule_compaction()
+
+    def delete(self, chunk_ids: List[str]):
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in self._locations]
+                if not chunk_ids:
+                    return
+                self._append({"delete": chunk_ids})
+                self._apply_delete(chunk_ids)
+
+    def delete_document(self, doc_id: str) -> List[str]:
+        """Delete a document's chunks and attributes, returning the chunk ids."""
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                chunk_ids = list(self._by_document.get(doc_id, ()))
+                self.delete(chunk_ids)
+                if self._documents.pop(doc_id, None) is not None:
+                    self._save_documents()
+                return chunk_ids
+
+    def compact(self, shards: Optional[List[str]] = None) -> bool:
+        """Merge ``shards`` (default: all of them) into one, dropping deleted and superseded rows.
+
+        The merged shard is written without holding any lock, so reads and
+        writes carry on meanwhile. Returns False when the shards changed
+        underneath (another process merged some of them).
+        """
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                shards = list(self._tables) if shards is None else list(shards)
+                if not shards or any(shard not in self._tables for shard in shards):
+                    return False
+                sources = set(shards)
+                parts = []
+                for shard in shards:
+                    table = self._tables[shard]
+                    rows = [
+                        row for row, chunk_id in enumerate(table.column("id").to_pylist())
+                        if self._locations.get(chunk_id) == (shard, row)
+                    ]
+                    if rows:
+                        parts.append(table.take(pa.array(rows, type=pa.int64())))
+                # Reserve the name so concurrent writers skip it
+                merged = f"shard-{self._next_shard:06d}.arrow"
+                self._next_shard += 1
+                self._save_manifest()
+
+        _write_shard(self.path / merged, pa.concat_tables(parts).unify_dictionaries().combine_chunks() if parts else None)
+
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                if any(shard not in self._tables for shard in shards):
+                    (self.path / merged).unlink(missing_ok=True)
+                    return False
+
+                # The merged shard takes the log position of the newest source, so
+                # adds and deletes logged between the sources still apply after it
+                last = max(i for i, entry in enumerate(self._log) if entry.get("add") in sources)
+                log = [
+                    {"seq": entry["seq"], "add": merged} if i == last else entry
+                    for i, entry in enumerate(self._log)
+                    if i == last or entry.get("add") not in sources
+                ]
+                # Deletes logged before the oldest shard have nothing left to delete
+                first_add = next(i for i, entry in enumerate(log) if "add" in entry)
+                if first_add:
+                    self._floor = max(self._floor, log[first_add - 1]["seq"])
+                self._log = log[first_add:]
+
+                seq = self._next_seq
+                self._next_seq += 1
+                self._merges.append({"seq": seq, "into": merged, "from": shards})
+                if len(self._merges) > MERGE_HISTORY:
+                    self._floor = max(self._floor, self._merges[-MERGE_HISTORY - 1]["seq"])
+                    self._merges = self._merges[-MERGE_HISTORY:]
+                self._apply_merge(merged, shards)
+                self._applied_seq = seq
+                self._save_manifest()
+
+            # Processes that still map these keep reading them until they sync
+            for shard in shards:
+                (self.path / shard).unlink(missing_ok=True)
+        logger.info(f"Compacted {len(shards)} chunk store shards into {merged}")
+        return True
+
+    # -- Internals -----------------------------------------------------------
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.path / "manifest.json"
+
+    @property
+    def _documents_path(self) -> Path:
+        return self.path / "documents.json"
+
+    def _refresh(self):
+        """Pick up writes from other processes; a stat per call when nothing changed."""
+        if (file_stamp(self._manifest_path) != self._manifest_stamp
+                or file_stamp(self._documents_path) != self._documents_stamp):
+            with self._file_lock:
+                self._sync()
+
+    def _sync(self):
+        # Caller holds the file lock, so the files cannot change while being read
+        # and the shards the manifest names are still on disk
+        manifest_stamp = file_stamp(self._manifest_path)
+        if manifest_stamp != self._manifest_stamp:
+            manifest = None
+            if manifest_stamp is not None:
+                with open(self._manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("version") != MANIFEST_VERSION:
+                    raise ValueError(f"Unsupported chunk store version: {manifest.get('version')}")
+            with self._lock:
+                self._load_manifest(manifest or {"log": [], "next_shard": 1})
+            self._manifest_stamp = manifest_stamp
+
+        documents_stamp = file_stamp(self._documents_path)
+        if documents_stamp != self._documents_stamp:
+            documents = {}
+            if documents_stamp is not None:
+                with open(self._documents_path, encoding="utf-8") as f:
+                    documents = json.load(f)
+            with self._lock:
+                self._documents = documents
+            self._documents_stamp = documents_stamp
+
+    def _load_manifest(self, manifest: Dict[str, Any]):
+        log = manifest["log"]
+        for seq, entry in enumerate(log, start=1):
+            entry.setdefault("seq", seq)  # Manifests written before sequence numbers
+        merges = manifest.get("merges", [])
+        floor = manifest.get("floor", 0)
+
+        pending = sorted(
+            [entry for entry in log + merges if entry["seq"] > self._applied_seq],
+            key=lambda entry: entry["seq"]
+        )
+        caught_up = (
+            self._applied_seq > 0
+            and manifest.get("id") == self._store_id
+            and floor <= self._applied_seq
+            and self._apply_pending(pending)
+        )
+        if not caught_up:
+            tables = self._tables
+            self._reset()
+            for entry in log:
+                if "add" in entry:
+                    self._apply_add(entry["add"], tables.get(entry["add"]))
+                else:
+                    self._apply_delete(entry["delete"])
+
+        self._store_id = manifest.get("id")
+        self._log = log
+        self._merges = merges
+        self._floor = floor
+        self._next_shard = manifest["next_shard"]
+        self._next_seq = manifest.get("next_seq", len(log) + 1)
+        self._applied_seq = self._next_seq - 1
+
+    def _apply_pending(self, pending: List[Dict[str, Any]]) -> bool:
+        """Apply new entries in sequence order; False when only a full replay can catch up."""
+        try:
+            for entry in pending:
+                if "into" in entry:
+                    if any(shard not in self._tables for shard in entry["from"]):
+                        return False
+                    self._apply_merge(entry["into"], entry["from"])
+                elif "add" in entry:
+                    self._apply_add(entry["add"])
+                else:
+                    self._apply_delete(entry["delete"])
+        except FileNotFoundError:  # Merged away since
+            return False
+        return True
+
+    def _append(self, entry: Dict[str, Any]):
+        entry["seq"] = self._next_seq
+        self._next_seq += 1
+        self._log.append(entry)
+        self._applied_seq = entry["seq"]
+        self._save_manifest()
+
+    def _save_manifest(self):
+        if self._store_id is None:
+            self._store_id = uuid.uuid4().hex
+        _write_json(self._manifest_path, {
+            "version": MANIFEST_VERSION,
+            "id": self._store_id,
+            "next_shard": self._next_shard,
+            "next_seq": self._next_seq,
+            "floor": self._floor,
+            "log": self._log,
+            "merges": self._merges,
+        })
+        self._manifest_stamp = file_stamp(self._manifest_path)
+
+    def _save_documents(self):
+        _write_json(self._documents_path, self._documents)
+        self._documents_stamp = file_stamp(self._documents_path)
+
+    def _schedule_compaction(self):
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self._plan_compaction() is None:
+                return
+            self._compactor = threading.Thread(target=self._compact_tiers, name="chunk-store-compaction", daemon=True)
+            self._compactor.start()
+
+    def _plan_compaction(self) -> Optional[List[str]]:
+        """``fanin`` shards of the smallest size tier that has that many, if any."""
+        tiers: Dict[int, List[str]] = {}
+        for shard, table in self._tables.items():
+            tiers.setdefault(int(math.log(max(table.num_rows, 1), self.compaction_fanin)), []).append(shard)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.compaction_fanin:
+                return tiers[tier][:self.compaction_fanin]
+        return None
+
+    def _compact_tiers(self):
+        try:
+            while True:
+                with self._lock:
+                    shards = self._plan_compaction()
+                if shards is None or not self.compact(shards):
+                    return
+        except Exception as e:
+            logger.error(f"Chunk store compaction failed: {e}")
+
+    def _reset(self):
+        self._tables = {}
+        self._locations = {}
+        self._by_document = {}
+
+    def _map(self, shard: str) -> pa.Table:
+        # Memory-mapped and zero-copy: columns are only paged in when read
+        source = pa.memory_map(str(self.path / shard), "r")
+        table = pa.ipc.open_file(source).read_all()
+        for field in SCHEMA:
+            if field.name not in table.column_names:  # Shards written before the column existed
+                table = table.append_column(field, pa.nulls(len(table), field.type))
+        return table.select(SCHEMA.names)
+
+    def _apply_add(self, shard: str, table: Optional[pa.Table] = None):
+        table = table if table is not None else self._map(shard)
+        self._tables[shard] = table
+
+        ids = table.column("id").to_pylist()
+        doc_ids = table.column("doc_id").to_pylist()
+        for row, (chunk_id, doc_id) in enumerate(zip(ids, doc_ids)):
+            self._locations[chunk_id] = (shard, row)
+            self._by_document.setdefault(doc_id, set()).add(chunk_id)
+
+    def _apply_merge(self, merged: str, shards: List[str]):
+        # Rows still live in the sources moved to the merged shard; ids and
+        # documents are unchanged
+        table = self._map(merged)
+        sources = set(shards)
+        for row, chunk_id in enumerate(table.column("id").to_pylist()):
+            location = self._locations.get(chunk_id)
+            if location is not None and location[0] in sources:
+                self._locations[chunk_id] = (merged, row)
+        for shard in shards:
+            del self._tables[shard]
+        self._tables[merged] = table
+
+    def _apply_delete(self, chunk_ids: List[str]):
+        for chunk_id in chunk_ids:
+            location = self._locations.pop(chunk_id, None)
+            if location is None:
+                continue
+            shard, row = location
+            doc_id = self._tables[shard].column("doc_id")[row].as_py()
+            doc_chunks = self._by_document.get(doc_id)
+            if doc_chunks is not None:
+                doc_chunks.discard(chunk_id)
+                if not doc_chunks:
+                    del self._by_document[doc_id]
@@ -0,0 +1,84 @@
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+import asyncio
+import time
+import uuid
+
+from ..core.config import settings
+
+
+@dataclass
+class ConversationSession:
+    """Conversation state kept between turns.
+
+    ``context_ids``/``context_documents`` hold the pinned retrieval that forms
+    the cached prompt prefix; they only change when a follow-up's retrieval no
+    longer overlaps enough with them.
+    """
+    id: str
+    user_id: str
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    last_active: float = field(default_factory=time.monotonic)
+    history: List[Dict[str, str]] = field(default_factory=list)
+    context_ids: List[str] = field(default_factory=list)
+    context_documents: List[str] = field(default_factory=list)
+    context_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    usage: Dict[str, int] = field(default_factory=lambda: {
+        "input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "output_tokens": 0,
+    })
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def add_usage(self, usage: Dict[str, int]):
+        for key, value in usage.items():
+            self.usage[key] = self.usage.get(key, 0) + value
+
+
+class ConversationStore:
+    """In-memory session store with idle expiry.
+
+    Sessions live in the worker process that created them, so follow-ups must
+    reach the same worker: run the API with one worker, or route
+    ``/queries/sessions/{id}`` requests to a fixed worker (sticky sessions).
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_sessions: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or settings.SESSION_TTL_SECONDS
+        self.max_sessions = max_sessions or settings.SESSION_MAX_SESSIONS
+        self._sessions: Dict[str, ConversationSession] = {}
+
+    def create(self, user_id: str) -> ConversationSession:
+        self._evict()
+        session = ConversationSession(id=str(uuid.uuid4()), user_id=user_id)
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str, user_id: str) -> Optional[ConversationSession]:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is None or session.user_id != user_id:
+            return None
+        session.last_active = time.monotonic()
+        return session
+
+    def delete(self, session_id: str, user_id: str) -> bool:
+        session = self.get(session_id, user_id)
+        if session is None:
+            return False
+        del self._sessions[session_id]
+        return True
+
+    def _evict(self):
+        """Drop expired sessions, then the least recently used ones over capacity."""
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_active > self.ttl_seconds:
+                del self._sessions[session_id]
+
+        if len(self._sessions) >= self.max_sessions:
+            by_age = sorted(self._sessions.values(), key=lambda s: s.last_active)
+            for session in by_age[:len(self._sessions) - self.max_sessions + 1]:
+                del self._sessions[session.id]
@@ -1,38 +1,45 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 from pathlib import Path
+import asyncio
 import base64
-from PIL import Image
-import io
 import pandas as pd
 import nbformat
 import markdown
 from unstructured.partition.auto import partition
-from unstructured.partition.image import partition_image
 from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.docx import partition_docx
 from unstructured.partition.pptx import partition_pptx
 
 from ..core.logger import logger
 from ..models.document import DocumentChunk, ChunkType
+from .image_pipeline import image_pipeline
+from .text_loader import text_loader
 
 class DocumentLoader:
     def __init__(self):
         self.handlers = {
             ".pdf": self._handle_pdf,
             ".docx": self._handle_docx,
+            ".txt": self._handle_text,
             ".pptx": self._handle_pptx,
             ".xlsx": self._handle_excel,
             ".csv": self._handle_csv,
             ".md": self._handle_markdown,
             ".ipynb": self._handle_notebook,
+            ".py": self._handle_python,
             ".png": self._handle_image,
             ".jpg": self._handle_image,
             ".jpeg": self._handle_image,
             ".html": self._handle_html,
         }
 
-    async def load_document(self, file_path: Path) -> List[DocumentChunk]:
-        """Load a document and return its chunks."""
+    async def load_document(self, file_path: Path) -> Iterable[DocumentChunk]:
+        """Load a document and return its chunks.
+
+        Text and Python files come back as a lazy iterator that reads the file
+        as it is consumed; consume it off the event loop, as
+        ``RAGPipeline.process_document`` does.
+        """
         try:
             suffix = file_path.suffix.lower()
             if suffix not in self.handlers:
@@ -177,40 +184,45 @@ class DocumentLoader:
         
         return chunks
 
+    async def _handle_text(self, file_path: Path) -> Iterator[DocumentChunk]:
+        """Handle plain text files, streamed from a memory map as the chunks are consumed."""
+        return text_loader.iter_text(file_path)
+
+    async def _handle_python(self, file_path: Path) -> Iterator[DocumentChunk]:
+        """Handle Python source, chunked along functions and classes as the chunks are consumed."""
+        return text_loader.iter_python(file_path)
+
     async def _handle_image(self, file_path: Path) -> List[DocumentChunk]:
         """Handle image files."""
-        # Open and convert image to base64
-        with Image.open(file_path) as img:
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='JPEG')
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        # Downscale and encode once; repeated uploads of the same image hit the cache
+        image = await asyncio.to_thread(image_pipeline.prepare_file, file_path)
         
-        # Use unstructured to extract text from image
-        elements = partition_image(file_path)
+        # Extract text from the image on the OCR worker pool
+        texts = await image_pipeline.ocr(file_path)
         
         chunks = []
         # Add the image itself
         chunks.append(DocumentChunk(
-            text=img_base64,
+            text=image.data,
             chunk_type=ChunkType.IMAGE,
             page_num=0,
-            metadata={"type": "image"}
+            metadata={
+                "type": "image",
+                "media_type": image.media_type,
+                "width": image.width,
+                "height": image.height,
+                "content_hash": image.content_hash
+            }
         ))
         
         # Add any extracted text
-        for element in elements:
-            if str(element).strip():
-                chunks.append(DocumentChunk(
-                    text=str(element),
-                    chunk_type=ChunkType.TEXT,
-                    page_num=0,
-                    metadata={"type": "image_text"}
-                ))
+        for text in texts:
+            chunks.append(DocumentChunk(
+                text=text,
+                chunk_type=ChunkType.TEXT,
+                page_num=0,
+                metadata={"type": "image_text"}
+            ))
         
         return chunks
 
@@ -0,0 +1,235 @@
+"""Shared embedding server.
+
+Runs one copy of the embedding model per host and lets every API worker reach
+it over a Unix socket (or localhost TCP). Requests from concurrent callers are
+micro-batched: the batcher waits at most ``EMBEDDING_BATCH_MAX_WAIT_MS`` for
+more work before running the model on up to ``EMBEDDING_BATCH_SIZE`` texts.
+
+Start it with::
+
+    python -m app.services.embedding_server
+"""
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+
+from ..core.config import settings
+from ..core.logger import logger
+
+# Every frame is a 4-byte big-endian length followed by a UTF-8 JSON body
+_HEADER = struct.Struct("!I")
+
+
+def load_local_embedding_model():
+    """Load the in-process BGE embedding model."""
+    from langchain.embeddings import HuggingFaceBgeEmbeddings
+
+    return HuggingFaceBgeEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def _encode_frame(payload: Dict[str, Any]) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+class EmbeddingServer:
+    def __init__(
+        self,
+        model=None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[int] = None
+    ):
+        self.model = model or load_local_embedding_model()
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_BATCH_MAX_WAIT_MS) / 1000
+        self.query_instruction = getattr(self.model, "query_instruction", "")
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def embed(self, texts: List[str], kind: str = "documents") -> List[List[float]]:
+        """Queue texts for the next batch and wait for their vectors."""
+        if kind == "query":
+            texts = [self.query_instruction + text for text in texts]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _batch_loop(self):
+        """Collect queued requests into micro-batches and run the model."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(None, self.model.embed_documents, texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests from one client connection until it closes."""
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (length,) = _HEADER.unpack(header)
+                request = json.loads(await reader.readexactly(length))
+
+                try:
+                    vectors = await self.embed(request["texts"], request.get("kind", "documents"))
+                    response = {"embeddings": vectors}
+                except Exception as e:
+                    response = {"error": str(e)}
+
+                writer.write(_encode_frame(response))
+                await writer.drain()
+        except Exception as e:
+            logger.error(f"Embedding server connection error: {str(e)}")
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Listen on the configured socket and serve forever."""
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+
+        if settings.EMBEDDING_SERVER_SOCKET:
+            socket_path = Path(settings.EMBEDDING_SERVER_SOCKET)
+            if socket_path.exists():
+                socket_path.unlink()
+            server = await asyncio.start_unix_server(self._handle_connection, path=str(socket_path))
+            logger.info(f"Embedding server listening on {socket_path}")
+        else:
+            server = await asyncio.start_server(
+                self._handle_connection,
+                host=settings.EMBEDDING_SERVER_HOST,
+                port=settings.EMBEDDING_SERVER_PORT
+            )
+            logger.info(
+                f"Embedding server listening on "
+                f"{settings.EMBEDDING_SERVER_HOST}:{settings.EMBEDDING_SERVER_PORT}"
+            )
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class EmbeddingClient:
+    """Drop-in replacement for the local embedding model backed by EmbeddingServer.
+
+    Each thread keeps its own persistent connection, so the blocking calls made
+    from ``RAGPipeline`` never interleave frames on a shared socket.
+    """
+
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        if settings.EMBEDDING_SERVER_SOCKET:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(settings.EMBEDDING_SERVER_SOCKET)
+        else:
+            sock = socket.create_connection(
+                (settings.EMBEDDING_SERVER_HOST, settings.EMBEDDING_SERVER_PORT),
+                timeout=self.timeout
+            )
+        return sock
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            part = sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError("Embedding server closed the connection")
+            data.extend(part)
+        return bytes(data)
+
+    def _roundtrip(self, sock: socket.socket, frame: bytes) -> Dict[str, Any]:
+        sock.sendall(frame)
+        (length,) = _HEADER.unpack(self._recv_exactly(sock, _HEADER.size))
+        return json.loads(self._recv_exactly(sock, length))
+
+    def _request(self, texts: List[str], kind: str) -> List[List[float]]:
+        frame = _encode_frame({"texts": texts, "kind": kind})
+        sock = getattr(self._local, "sock", None)
+
+        # Retry once on a fresh connection in case the server was restarted
+        for attempt in range(2):
+            if sock is None:
+                sock = self._connect()
+                self._local.sock = sock
+            try:
+                response = self._roundtrip(sock, frame)
+                break
+            except (ConnectionError, OSError):
+                sock.close()
+                sock = self._local.sock = None
+                if attempt:
+                    raise
+
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return response["embeddings"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._request(list(texts), "documents")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._request([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._request(list(texts), "query")
+
+
+def main():
+    server = EmbeddingServer()
+    logger.info(
+        f"Loaded {settings.EMBEDDING_MODEL} (pid {os.getpid()}), "
+        f"batch size {server.max_batch_size}, max wait {server.max_wait * 1000:.0f}ms"
+    )
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
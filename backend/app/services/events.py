@@ -0,0 +1,97 @@
+from typing import Any, Dict, Hashable, Set
+from collections import OrderedDict, defaultdict
+import asyncio
+import itertools
+import threading
+
+from ..core.config import settings
+
+# Stages ending a document's ingest; the client waits for one of them
+TERMINAL_STAGES = ("indexed", "failed")
+
+
+class Subscription:
+    """Coalescing event buffer for one subscriber.
+
+    Progress events of a document supersede each other, so at most one is
+    pending per document: a newer one replaces it in place. Terminal events
+    (``indexed``, ``failed``) replace the document's pending progress and
+    are never dropped. If more than ``maxsize`` events are still pending, the
+    oldest progress event is dropped instead of blocking publishers.
+    ``offer`` may be called from any thread.
+    """
+
+    def __init__(self, maxsize: int):
+        self.loop = asyncio.get_running_loop()
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pending: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._sequence = itertools.count()
+        self._thread_id = threading.get_ident()
+
+    def offer(self, event: Dict[str, Any]):
+        if threading.get_ident() == self._thread_id:
+            self._put(event)
+        else:
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: Dict[str, Any]):
+        doc_id = event.get("doc_id")
+        if event.get("stage") in TERMINAL_STAGES:
+            if self._pending.pop(doc_id, None) is not None:
+                self.dropped += 1
+            key: Hashable = (doc_id, next(self._sequence))  # Unique, so never replaced
+        else:
+            key = doc_id
+
+        if key in self._pending:
+            self.dropped += 1
+        elif len(self._pending) >= self.maxsize:
+            oldest = next(
+                (pending for pending, queued in self._pending.items() if queued.get("stage") not in TERMINAL_STAGES),
+                None
+            )
+            if oldest is not None:
+                del self._pending[oldest]
+                self.dropped += 1
+        self._pending[key] = event
+        self._ready.set()
+
+    async def get(self) -> Dict[str, Any]:
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._pending.popitem(last=False)[1]
+
+
+class ProgressBus:
+    """Per-user fan-out of ingest progress events to live connections."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(settings.WS_PROGRESS_BUFFER_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: str, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+
+progress_bus = ProgressBus()
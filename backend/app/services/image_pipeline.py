@@ -0,0 +1,167 @@
+from typing import List, Dict, Any, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import asyncio
+import base64
+import hashlib
+import io
+import math
+import threading
+from PIL import Image, ImageOps
+
+from ..core.config import settings
+from ..core.logger import logger
+
+# Formats Claude accepts as-is, keyed by PIL format name
+SUPPORTED_MEDIA_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+EXIF_ORIENTATION = 0x0112
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: str  # base64
+    media_type: str
+    width: int
+    height: int
+    content_hash: str
+
+    def to_content_block(self) -> Dict[str, Any]:
+        """Claude message content block for this image."""
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": self.media_type,
+                "data": self.data
+            }
+        }
+
+
+class ImagePipeline:
+    """Shared image preprocessing: format detection, downscaling and encoding.
+
+    Results are cached by the SHA-256 of the input bytes, so an image that is
+    sent or indexed repeatedly is only decoded and encoded once. OCR runs one
+    image per task on a bounded thread pool (``OCR_WORKERS``); the OCR backend
+    has no batch API, so grouping images would only add latency.
+    """
+
+    def __init__(
+        self,
+        max_edge: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        ocr_workers: Optional[int] = None
+    ):
+        self.max_edge = max_edge or settings.IMAGE_MAX_EDGE
+        self.max_pixels = max_pixels or settings.IMAGE_MAX_PIXELS
+        self.cache_size = cache_size or settings.IMAGE_CACHE_SIZE
+        self.ocr_workers = ocr_workers or settings.OCR_WORKERS
+        self._cache: "OrderedDict[str, PreparedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ocr_executor: Optional[ThreadPoolExecutor] = None
+
+    def prepare(self, raw: bytes) -> PreparedImage:
+        """Detect the format, downscale if needed and base64-encode image bytes."""
+        content_hash = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+                return cached
+
+        with Image.open(io.BytesIO(raw)) as img:
+            image_format = img.format
+            # Phone photos store their rotation in EXIF, which re-encoding drops
+            rotated = img.getexif().get(EXIF_ORIENTATION, 1) != 1
+            if rotated:
+                img = ImageOps.exif_transpose(img)
+            width, height = img.size
+            scale = min(
+                1.0,
+                self.max_edge / max(width, height),
+                math.sqrt(self.max_pixels / (width * height))
+            )
+            animated = getattr(img, "is_animated", False)
+
+            if image_format in SUPPORTED_MEDIA_TYPES and scale == 1.0 and not animated and not rotated:
+                # Already small enough and in an accepted format: send the original bytes
+                media_type = SUPPORTED_MEDIA_TYPES[image_format]
+                data = raw
+            else:
+                if scale < 1.0:
+                    width, height = max(1, int(width * scale)), max(1, int(height * scale))
+                    img = img.resize((width, height), Image.LANCZOS)
+                data, media_type = self._encode(img)
+
+        prepared = PreparedImage(
+            data=base64.b64encode(data).decode(),
+            media_type=media_type,
+            width=width,
+            height=height,
+            content_hash=content_hash
+        )
+        with self._lock:
+            self._cache[content_hash] = prepared
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return prepared
+
+    def prepare_base64(self, image_data: str) -> PreparedImage:
+        """Prepare a base64 string, accepting ``data:`` URLs as sent by browsers."""
+        if image_data.startswith("data:"):
+            image_data = image_data.split(",", 1)[1]
+        return self.prepare(base64.b64decode(image_data))
+
+    def prepare_file(self, file_path: Union[str, Path]) -> PreparedImage:
+        with open(file_path, "rb") as f:
+            return self.prepare(f.read())
+
+    def _encode(self, img: Image.Image):
+        """Re-encode as PNG when transparency matters, JPEG otherwise."""
+        buffer = io.BytesIO()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            img.convert("RGBA").save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(buffer, format="JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+    def _ocr_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._ocr_executor is None:
+                self._ocr_executor = ThreadPoolExecutor(
+                    max_workers=self.ocr_workers,
+                    thread_name_prefix="ocr"
+                )
+            return self._ocr_executor
+
+    async def ocr(self, file_path: Union[str, Path]) -> List[str]:
+        """OCR one image on the worker pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ocr_pool(), _ocr_image, file_path)
+
+
+def _ocr_image(file_path: Union[str, Path]) -> List[str]:
+    """Extract non-empty text elements from an image."""
+    from unstructured.partition.image import partition_image
+
+    try:
+        elements = partition_image(filename=str(file_path))
+    except Exception as e:
+        logger.error(f"OCR failed for {file_path}: {str(e)}")
+        return []
+    return [str(element) for element in elements if str(element).strip()]
+
+
+image_pipeline = ImagePipeline()
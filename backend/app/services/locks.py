@@ -0,0 +1,47 @@
+from typing import Optional, Tuple, Union
+from pathlib import Path
+import fcntl
+import os
+import threading
+
+
+class InterProcessLock:
+    """Re-entrant exclusive lock shared by the threads of this process and other processes.
+
+    Threads are serialized by an ``RLock``; processes (uvicorn workers) by an
+    ``flock`` on ``path``, taken when the outermost holder enters.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self) -> "InterProcessLock":
+        self._lock.acquire()
+        try:
+            if self._depth == 0:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+def file_stamp(path: Union[str, Path]) -> Optional[Tuple[int, int, int]]:
+    """Identity of a file's current version, to notice other processes replacing it."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
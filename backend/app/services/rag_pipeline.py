@@ -1,38 +1,55 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Iterable, Tuple
+from collections.abc import Sized
 from pathlib import Path
+from functools import lru_cache
+from itertools import islice
+import asyncio
 import base64
+import hashlib
 import anthropic
-from langchain.embeddings import HuggingFaceBgeEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from chromadb.config import Settings as ChromaSettings
-from chromadb.utils import embedding_functions
-import chromadb
 
 from ..core.config import settings
 from ..core.logger import logger
 from ..models.document import DocumentChunk
+from .chunk_store import SOURCE_COLUMNS, ChunkStore
+from .conversation import ConversationSession
+from .embedding_server import EmbeddingClient, load_local_embedding_model
+from .image_pipeline import image_pipeline
+from .locks import InterProcessLock
+from .vector_store import create_vector_store
+
+# Called as progress(stage, count, total) while a document is ingested; total
+# is 0 while a streamed document's size is unknown
+ProgressCallback = Callable[[str, int, int], None]
+# Called with the document's chunk ids (the deleted ones for a delete) and the
+# write lock held, on a worker thread; commits the database rows describing the
+# change, so snapshots (which take the same lock) see the rows and the chunks
+# together. On ingest it runs once the new chunks are stored but before the old
+# ones are dropped, and raising rolls the stores back to the previous version
+CommitCallback = Callable[[List[str]], None]
+
+SYSTEM_PROMPT = """You are an AI assistant helping users understand technical documents. 
+Answer questions based on the provided context. If you cannot answer from the context, 
+say so. Always cite sources using [doc_id:page] format."""
 
 class RAGPipeline:
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self.async_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         
-        # Initialize embedding model
-        self.embedding_model = HuggingFaceBgeEmbeddings(
-            model_name=settings.EMBEDDING_MODEL,
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # Initialize embedding model, either in-process or via the shared server
+        if settings.EMBEDDING_BACKEND == "server":
+            self.embedding_model = EmbeddingClient()
+        else:
+            self.embedding_model = load_local_embedding_model()
         
-        # Initialize ChromaDB
-        chroma_client = chromadb.PersistentClient(
-            path=settings.VECTOR_STORE_PATH,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
-        
-        self.collection = chroma_client.get_or_create_collection(
-            name="document_store",
-            embedding_function=embedding_functions.DefaultEmbeddingFunction(),
-            metadata={"hnsw:space": "cosine"}
-        )
+        # The vector store only holds chunk ids and vectors; text and attributes
+        # live in the chunk store
+        self.vector_store = create_vector_store()
+        self.chunk_store = ChunkStore()
+        # Held while both stores and the document rows are written, by every
+        # worker, so snapshots see them consistent; queries never take it
+        self.write_lock = InterProcessLock(Path(settings.CHUNK_STORE_PATH).parent / ".write.lock")
         
         # Text splitter for chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -42,101 +59,525 @@ class RAGPipeline:
             separators=["\n\n", "\n", " ", ""]
         )
 
-    async def process_document(self, document_path: Path, metadata: Dict[str, Any]) -> List[str]:
-        """Process a document and store its chunks in the vector store."""
+    async def process_document(
+        self,
+        document_path: Path,
+        metadata: Dict[str, Any],
+        chunks: Optional[Iterable[DocumentChunk]] = None,
+        progress: Optional[ProgressCallback] = None,
+        commit: Optional[CommitCallback] = None
+    ) -> List[str]:
+        """Process a document and store its chunks in the vector store.
+
+        ``chunks`` may be a lazy iterator (text and source files); it is
+        consumed on a worker thread one embedding batch at a time, so the
+        document is never held in memory whole.
+
+        ``progress`` is called as ``progress(stage, count, total)`` for the
+        "chunked", "embedded" and "indexed" stages; it may run on a worker thread.
+        ``commit`` is called with the chunk ids once they are stored, under the write lock.
+        """
         try:
-            # Extract text and create chunks
-            chunks = self._create_chunks(document_path, metadata)
+            # Extract text and create chunks unless the loader already did
+            if chunks is None:
+                chunks = self._create_chunks(document_path, metadata)
             
-            # Store chunks in vector store
-            chunk_ids = []
-            for chunk in chunks:
-                chunk_id = f"{metadata['doc_id']}_{len(chunk_ids)}"
-                
-                # Get embeddings
-                embeddings = self.embedding_model.embed_documents([chunk.text])
-                
-                # Store in ChromaDB
-                self.collection.add(
-                    ids=[chunk_id],
-                    embeddings=embeddings,
-                    documents=[chunk.text],
-                    metadatas=[{
-                        "doc_id": metadata["doc_id"],
-                        "chunk_type": chunk.chunk_type,
-                        "page_num": chunk.page_num,
-                        **metadata
-                    }]
-                )
-                chunk_ids.append(chunk_id)
-            
-            return chunk_ids
+            # Store chunks in vector store, off the event loop
+            result = await asyncio.to_thread(self._index_chunks, chunks, metadata, {}, progress, commit)
+            return result["chunk_ids"]
             
         except Exception as e:
             logger.error(f"Error processing document {document_path}: {str(e)}")
             raise
 
+    async def update_document(
+        self,
+        chunks: Iterable[DocumentChunk],
+        metadata: Dict[str, Any],
+        progress: Optional[ProgressCallback] = None,
+        commit: Optional[CommitCallback] = None
+    ) -> Dict[str, Any]:
+        """Re-index a changed document by diffing its chunks against the stored ones.
+
+        Chunks are matched on a content hash, so only new chunks are embedded
+        and inserted, removed chunks are deleted and unchanged chunks keep their
+        ids and vectors with their metadata (page, lines, ...) updated in place.
+        New chunks are embedded and stored before anything is removed, so a
+        failure leaves the previous version fully searchable. ``chunks`` may be
+        a lazy iterator, as for ``process_document``; ``commit`` is called under
+        the write lock once the new version replaced the old one.
+        """
+        doc_id = metadata["doc_id"]
+        try:
+            stored_ids = await asyncio.to_thread(self._stored_chunk_keys, doc_id)
+            return await asyncio.to_thread(self._index_chunks, chunks, metadata, stored_ids, progress, commit)
+            
+        except Exception as e:
+            logger.error(f"Error updating document {doc_id}: {str(e)}")
+            raise
+
+    def _index_chunks(
+        self,
+        chunks: Iterable[DocumentChunk],
+        metadata: Dict[str, Any],
+        stored_ids: Dict[str, str],
+        progress: Optional[ProgressCallback] = None,
+        commit: Optional[CommitCallback] = None
+    ) -> Dict[str, Any]:
+        """Store ``chunks`` as the new content of a document, one embedding batch at a time.
+
+        ``stored_ids`` maps chunk key -> id for the document's current chunks.
+        Chunks whose key is stored keep their id and vector, new ones are
+        embedded and stored batch by batch. Once all are in, ``commit`` is
+        called, and only if it succeeds are the document attributes switched
+        and chunks no longer present deleted, all in one locked step. Until
+        then a failure deletes the new chunks and restores rewritten rows, so
+        the previous version stays whole.
+        """
+        doc_id = metadata["doc_id"]
+        total = len(chunks) if isinstance(chunks, Sized) else 0  # Unknown while streaming
+        if progress and total:
+            progress("chunked", total, total)
+        
+        counts: Dict[str, int] = {}
+        seen_keys = set()
+        chunk_ids: List[str] = []
+        added_ids: List[str] = []
+        previous_rows: List[Dict[str, Any]] = []
+        reused = 0
+        committed = False
+        try:
+            iterator = iter(chunks)
+            while batch := list(islice(iterator, settings.EMBEDDING_BATCH_SIZE)):
+                new: List[Tuple[str, str, DocumentChunk]] = []
+                kept: List[Tuple[str, str, DocumentChunk]] = []
+                for chunk in batch:
+                    key = self._next_chunk_key(chunk.text, chunk.chunk_type.value, counts)
+                    seen_keys.add(key)
+                    if key in stored_ids:
+                        kept.append((stored_ids[key], key, chunk))
+                    else:
+                        new.append((f"{doc_id}_{key}", key, chunk))
+                    chunk_ids.append(stored_ids.get(key) or f"{doc_id}_{key}")
+                
+                # Rewrite rows of kept chunks only when their attributes changed
+                changed, previous = self._changed_rows(kept)
+                embeddings = self.embedding_model.embed_documents([chunk.text for _, _, chunk in new]) if new else []
+                
+                # Chunk rows first, so every id the index can return hydrates
+                with self.write_lock:
+                    if changed:
+                        self.chunk_store.add(doc_id, *(list(column) for column in zip(*changed)))
+                        previous_rows.extend(previous)
+                    if new:
+                        new_ids, new_keys, new_chunks = (list(column) for column in zip(*new))
+                        self.chunk_store.add(doc_id, new_ids, new_keys, new_chunks)
+                        self.vector_store.add(new_ids, embeddings)
+                        added_ids.extend(new_ids)
+                reused += len(kept)
+                if progress:
+                    progress("embedded", len(chunk_ids), total)
+            
+            # Only once the new version is indexed and committed: switch attributes
+            # and drop the old chunks
+            removed_ids = [chunk_id for key, chunk_id in stored_ids.items() if key not in seen_keys]
+            with self.write_lock:
+                if commit:
+                    commit(chunk_ids)
+                committed = True
+                self.chunk_store.put_document(doc_id, self._document_attributes(metadata))
+                if removed_ids:
+                    self.chunk_store.delete(removed_ids)
+                    self.vector_store.delete(removed_ids)
+        
+        except Exception:
+            # After the commit the new version stands; leftovers are only old chunks
+            if not committed:
+                with self.write_lock:
+                    if not stored_ids:
+                        self.delete_document(doc_id)
+                    else:
+                        if added_ids:
+                            self.chunk_store.delete(added_ids)
+                            self.vector_store.delete(added_ids)
+                        self._restore_rows(doc_id, previous_rows)
+            raise
+        
+        if progress:
+            progress("indexed", len(chunk_ids), len(chunk_ids))
+        return {
+            "chunk_ids": chunk_ids,
+            "chunks_reused": reused,
+            "chunks_added": len(added_ids),
+            "chunks_removed": len(removed_ids)
+        }
+
+    def _changed_rows(
+        self,
+        kept: List[Tuple[str, str, DocumentChunk]]
+    ) -> Tuple[List[Tuple[str, str, DocumentChunk]], List[Dict[str, Any]]]:
+        """Kept ``(chunk_id, key, chunk)`` whose stored row is missing or has other attributes.
+
+        Also returns the stored attributes of those chunks (only the id when
+        missing), for ``_restore_rows``.
+        """
+        if not kept:
+            return [], []
+        ids = [chunk_id for chunk_id, _, _ in kept]
+        rows = self.chunk_store.get(ids, columns=["page_num", *SOURCE_COLUMNS])
+        changed = [
+            (item, row if row is not None else {"id": item[0]}) for item, row in zip(kept, rows)
+            if row is None
+            or row["page_num"] != (item[2].page_num or 0)
+            or any(row[column] != item[2].metadata.get(column) for column in SOURCE_COLUMNS)
+        ]
+        return [item for item, _ in changed], [row for _, row in changed]
+
+    def _restore_rows(self, doc_id: str, previous_rows: List[Dict[str, Any]]):
+        """Put back the attributes of rows rewritten by ``_index_chunks``.
+
+        Rows that did not exist before (chunks still held by Chroma) are
+        deleted again. The text is unchanged, so it is read from the store
+        one batch at a time.
+        """
+        self.chunk_store.delete([row["id"] for row in previous_rows if "page_num" not in row])
+        previous_rows = [row for row in previous_rows if "page_num" in row]
+        for start in range(0, len(previous_rows), settings.EMBEDDING_BATCH_SIZE):
+            batch = previous_rows[start:start + settings.EMBEDDING_BATCH_SIZE]
+            stored = self.chunk_store.get([row["id"] for row in batch], columns=["chunk_key", "chunk_type", "text"])
+            self.chunk_store.add(
+                doc_id,
+                [row["id"] for row in batch],
+                [current["chunk_key"] for current in stored],
+                [
+                    DocumentChunk(
+                        text=current["text"],
+                        chunk_type=current["chunk_type"],
+                        page_num=row["page_num"],
+                        metadata={column: row[column] for column in SOURCE_COLUMNS if row[column] is not None}
+                    )
+                    for row, current in zip(batch, stored)
+                ]
+            )
+
+    def delete_document(self, doc_id: str, commit: Optional[CommitCallback] = None):
+        """Remove a document's chunks from the chunk store and the vector index."""
+        with self.write_lock:
+            chunk_ids = self.chunk_store.delete_document(doc_id)
+            self.vector_store.delete(chunk_ids)
+            self.vector_store.legacy_delete_document(doc_id)
+            if commit:
+                commit(chunk_ids)
+
+    def _document_attributes(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in metadata.items() if key != "doc_id"}
+
+    def _stored_chunk_keys(self, doc_id: str) -> Dict[str, str]:
+        """Map chunk key -> chunk id for the stored chunks of a document."""
+        chunk_ids = self.chunk_store.document_chunk_ids(doc_id)
+        if chunk_ids:
+            rows = self.chunk_store.get(chunk_ids, columns=["chunk_key"])
+            return {row["chunk_key"]: row["id"] for row in rows}
+        
+        # Documents indexed before the chunk store keep text and metadata in Chroma
+        stored_ids: Dict[str, str] = {}
+        legacy_counts: Dict[str, int] = {}
+        for chunk_id, text, chunk_metadata in self.vector_store.legacy_document_chunks(doc_id):
+            key = chunk_metadata.get("chunk_key")
+            if key is None:
+                key = self._next_chunk_key(text, chunk_metadata.get("chunk_type", ""), legacy_counts)
+            stored_ids[key] = chunk_id
+        return stored_ids
+
+    def _next_chunk_key(self, text: str, chunk_type: str, counts: Dict[str, int]) -> str:
+        digest = hashlib.sha256(f"{chunk_type}\0{text}".encode("utf-8")).hexdigest()[:16]
+        occurrence = counts.get(digest, 0)
+        counts[digest] = occurrence + 1
+        return f"{digest}_{occurrence}"
+
     async def query(self, query: str, image_data: Optional[str] = None) -> Dict[str, Any]:
         """Query the RAG system with text and optional image."""
         try:
-            # Get relevant chunks from vector store
-            query_embedding = self.embedding_model.embed_query(query)
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=5,
-                include=["documents", "metadatas"]
+            # Get relevant chunks from vector store, off the event loop
+            query_embedding = await asyncio.to_thread(self.embedding_model.embed_query, query)
+            retrieval = (await asyncio.to_thread(self._retrieve, [query_embedding]))[0]
+            
+            # Prepare messages for Claude
+            messages = await asyncio.to_thread(self._build_messages, query, retrieval["documents"], image_data)
+            
+            # Get response from Claude
+            response = await self.async_client.messages.create(
+                model=settings.CLAUDE_MODEL,
+                max_tokens=1000,
+                system=SYSTEM_PROMPT,
+                messages=messages
             )
             
-            # Prepare context from retrieved chunks
-            context = "\n\n".join(results["documents"][0])
+            return {
+                "answer": response.content[0].text,
+                "sources": [m["doc_id"] for m in retrieval["metadatas"]]
+            }
             
-            # Prepare messages for Claude
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are an AI assistant helping users understand technical documents. 
-                    Answer questions based on the provided context. If you cannot answer from the context, 
-                    say so. Always cite sources using [doc_id:page] format."""
-                },
+        except Exception as e:
+            logger.error(f"Error querying RAG system: {str(e)}")
+            raise
+
+    async def stream_query(
+        self,
+        query: str,
+        image_data: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Query the RAG system, yielding answer tokens as Claude produces them.
+
+        Yields ``{"type": "token", "text": ...}`` events followed by one
+        ``{"type": "done", "sources": [...]}`` event.
+        """
+        query_embedding = await asyncio.to_thread(self.embedding_model.embed_query, query)
+        retrieval = (await asyncio.to_thread(self._retrieve, [query_embedding]))[0]
+        # Image decoding and resizing happen here, so keep them off the event loop
+        messages = await asyncio.to_thread(self._build_messages, query, retrieval["documents"], image_data)
+        
+        async with self.async_client.messages.stream(
+            model=settings.CLAUDE_MODEL,
+            max_tokens=1000,
+            system=SYSTEM_PROMPT,
+            messages=messages
+        ) as stream:
+            async for text in stream.text_stream:
+                yield {"type": "token", "text": text}
+        
+        yield {"type": "done", "sources": [m["doc_id"] for m in retrieval["metadatas"]]}
+
+    async def iter_batch_query(
+        self,
+        queries: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Answer many queries, yielding ``(index, result)`` pairs as they finish.
+
+        All queries are embedded in one model call and retrieved with a single
+        multi-query search; generation then runs concurrently under a semaphore.
+        A failed query yields a result with an ``error`` field instead of
+        aborting the batch.
+        """
+        embeddings = await asyncio.to_thread(self._embed_queries, queries)
+        retrievals = await asyncio.to_thread(self._retrieve, embeddings)
+        semaphore = asyncio.Semaphore(max_concurrency or settings.BATCH_QUERY_MAX_CONCURRENCY)
+
+        async def answer(index: int, query: str, retrieval: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    response = await self.async_client.messages.create(
+                        model=settings.CLAUDE_MODEL,
+                        max_tokens=1000,
+                        system=SYSTEM_PROMPT,
+                        messages=self._build_messages(query, retrieval["documents"])
+                    )
+                    return index, {
+                        "index": index,
+                        "query": query,
+                        "answer": response.content[0].text,
+                        "sources": [m["doc_id"] for m in retrieval["metadatas"]]
+                    }
+                except Exception as e:
+                    logger.error(f"Error answering batch query {index}: {str(e)}")
+                    return index, {"index": index, "query": query, "error": str(e)}
+
+        tasks = [
+            asyncio.create_task(answer(index, query, retrieval))
+            for index, (query, retrieval) in enumerate(zip(queries, retrievals))
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # Stop outstanding generations if the consumer goes away
+            for task in tasks:
+                task.cancel()
+
+    async def batch_query(
+        self,
+        queries: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many queries and return the results in input order."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        async for index, result in self.iter_batch_query(queries, max_concurrency):
+            results[index] = result
+        return results
+
+    async def chat(self, session: ConversationSession, question: str) -> Dict[str, Any]:
+        """Answer a follow-up question within a conversation session.
+
+        The system prompt and pinned context form a stable prefix that is sent
+        with ``cache_control`` so later turns read it from Anthropic's prompt
+        cache. When the new retrieval overlaps the pinned context enough, the
+        pinned chunks are reused and only unseen chunks are fetched and sent
+        with the question; otherwise the pinned context is replaced.
+        """
+        try:
+            query_embedding = await asyncio.to_thread(self.embedding_model.embed_query, question)
+            hit_ids = (await asyncio.to_thread(self._search, [query_embedding]))[0]
+            
+            pinned = set(session.context_ids)
+            overlap = len(pinned.intersection(hit_ids)) / len(hit_ids) if hit_ids else 0.0
+            context_reused = bool(pinned) and overlap >= settings.SESSION_CONTEXT_REUSE_OVERLAP
+            new_ids = [chunk_id for chunk_id in hit_ids if chunk_id not in pinned]
+            
+            if context_reused and len(pinned) + len(new_ids) > settings.SESSION_MAX_CONTEXT_CHUNKS:
+                context_reused = False
+            
+            extra_documents: List[str] = []
+            if context_reused:
+                if new_ids:
+                    extra_documents, extra_metadatas = await asyncio.to_thread(self._fetch_chunks, new_ids)
+            else:
+                new_ids = hit_ids
+                documents, metadatas = await asyncio.to_thread(self._fetch_chunks, hit_ids)
+                session.context_ids = list(hit_ids)
+                session.context_documents = documents
+                session.context_metadatas = metadatas
+            
+            context = "\n\n".join(session.context_documents)
+            system = [
+                {"type": "text", "text": SYSTEM_PROMPT},
                 {
-                    "role": "user",
-                    "content": f"Context:\n{context}\n\nQuestion: {query}"
+                    "type": "text",
+                    "text": f"Context:\n{context}",
+                    "cache_control": {"type": "ephemeral"}
                 }
             ]
             
-            # Add image if provided
-            if image_data:
-                messages[1]["content"] = [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_data
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": messages[1]["content"]
-                    }
-                ]
+            # Keep the last turns; the final history message is also a cache breakpoint
+            history = [dict(m) for m in session.history[-2 * settings.SESSION_MAX_HISTORY_TURNS:]]
+            if history:
+                history[-1]["content"] = [{
+                    "type": "text",
+                    "text": history[-1]["content"],
+                    "cache_control": {"type": "ephemeral"}
+                }]
             
-            # Get response from Claude
-            response = self.client.messages.create(
+            content = question
+            if extra_documents:
+                extra_context = "\n\n".join(extra_documents)
+                content = f"Additional context:\n{extra_context}\n\nQuestion: {question}"
+            
+            response = await self.async_client.messages.create(
                 model=settings.CLAUDE_MODEL,
                 max_tokens=1000,
-                messages=messages
+                system=system,
+                messages=history + [{"role": "user", "content": content}]
             )
+            answer = response.content[0].text
+            
+            # Store exactly what was sent so the cached prefix stays byte-identical next turn
+            session.history.append({"role": "user", "content": content})
+            session.history.append({"role": "assistant", "content": answer})
+            
+            usage = {
+                "input_tokens": response.usage.input_tokens,
+                "cache_read_input_tokens": getattr(response.usage, "cache_read_input_tokens", None) or 0,
+                "cache_creation_input_tokens": getattr(response.usage, "cache_creation_input_tokens", None) or 0,
+                "output_tokens": response.usage.output_tokens,
+            }
+            session.add_usage(usage)
+            
+            sources = [m["doc_id"] for m in session.context_metadatas]
+            if context_reused and new_ids:
+                sources += [m["doc_id"] for m in extra_metadatas]
             
             return {
-                "answer": response.content[0].text,
-                "sources": [m["doc_id"] for m in results["metadatas"][0]]
+                "answer": answer,
+                "sources": sources,
+                "context_reused": context_reused,
+                "new_chunks": len(new_ids),
+                "usage": usage
             }
             
         except Exception as e:
-            logger.error(f"Error querying RAG system: {str(e)}")
+            logger.error(f"Error in conversation {session.id}: {str(e)}")
             raise
 
+    def _search(self, query_embeddings: List[List[float]], n_results: int = 5) -> List[List[str]]:
+        """Return only the ids of the nearest chunks for each query embedding."""
+        results = self.vector_store.search(query_embeddings, n_results)
+        return [[chunk_id for chunk_id, _ in hits] for hits in results]
+
+    def _fetch_chunks(self, chunk_ids: List[str]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Fetch chunk texts and metadata, preserving the order of ``chunk_ids``."""
+        if not chunk_ids:
+            return [], []
+        rows = self.chunk_store.get(chunk_ids, columns=["doc_id", "page_num", "chunk_type", "text", *SOURCE_COLUMNS])
+        # Line numbers and definitions only exist for text and source files
+        rows = [
+            row and {column: value for column, value in row.items() if value is not None or column not in SOURCE_COLUMNS}
+            for row in rows
+        ]
+        
+        # Chunks indexed before the chunk store still have their text in Chroma
+        missing = [chunk_id for chunk_id, row in zip(chunk_ids, rows) if row is None]
+        legacy = self.vector_store.legacy_chunks(missing) if missing else {}
+        
+        found = [row or legacy.get(chunk_id) for chunk_id, row in zip(chunk_ids, rows)]
+        found = [row for row in found if row is not None]
+        return [row.pop("text") for row in found], found
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries in a single model call."""
+        if hasattr(self.embedding_model, "embed_queries"):
+            return self.embedding_model.embed_queries(queries)
+        # embed_query only prepends the instruction, so one embed_documents call is equivalent
+        instruction = getattr(self.embedding_model, "query_instruction", "")
+        return self.embedding_model.embed_documents([instruction + query for query in queries])
+
+    def _retrieve(self, query_embeddings: List[List[float]], n_results: int = 5) -> List[Dict[str, Any]]:
+        """Run one vector search for all query embeddings and hydrate the hits."""
+        hit_ids = self._search(query_embeddings, n_results)
+        
+        # Hydrate each distinct chunk once across the whole batch
+        unique_ids = list(dict.fromkeys(chunk_id for ids in hit_ids for chunk_id in ids))
+        documents, metadatas = self._fetch_chunks(unique_ids)
+        by_id = {m["id"]: (d, m) for d, m in zip(documents, metadatas)}
+        
+        retrievals = []
+        for ids in hit_ids:
+            found = [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+            retrievals.append({
+                "documents": [d for d, _ in found],
+                "metadatas": [m for _, m in found]
+            })
+        return retrievals
+
+    def _build_messages(
+        self,
+        query: str,
+        documents: List[str],
+        image_data: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Build the Claude messages for a query and its retrieved chunks."""
+        # Prepare context from retrieved chunks
+        context = "\n\n".join(documents)
+        
+        messages = [
+            {
+                "role": "user",
+                "content": f"Context:\n{context}\n\nQuestion: {query}"
+            }
+        ]
+        
+        # Add image if provided
+        if image_data:
+            image = image_pipeline.prepare_base64(image_data)
+            messages[0]["content"] = [
+                image.to_content_block(),
+                {
+                    "type": "text",
+                    "text": messages[0]["content"]
+                }
+            ]
+        
+        return messages
+
     def _create_chunks(self, document_path: Path, metadata: Dict[str, Any]) -> List[DocumentChunk]:
         """Create chunks from a document."""
         # This is a placeholder - actual implementation would use unstructured and
@@ -144,3 +585,9 @@ class RAGPipeline:
         chunks = []
         # Implementation details will be added in document_loader.py
         return chunks
+
+
+@lru_cache(maxsize=1)
+def get_rag_pipeline() -> RAGPipeline:
+    """Return the process-wide pipeline shared by all routers."""
+    return RAGPipeline()
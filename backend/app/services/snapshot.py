@@ -0,0 +1,314 @@
+"""Point-in-time snapshots of the retrieval state.
+
+A snapshot is a single tar archive holding the chunk store, the vector index
+and the SQLite database, plus a versioned ``snapshot.json`` manifest with file
+sizes and checksums. Taking one only pauses ingest in every worker (the
+pipeline write lock, under which routes also commit the document rows, so the
+database matches the stores), never queries: immutable files are hard-linked and append-only files are cut
+at their current length, so the lock is held for milliseconds except for
+backends whose files change in place (Chroma), which are copied.
+
+Restoring extracts the archive next to the data directories and swaps them in;
+the chunk store and (optionally) the FAISS index are memory-mapped on open, so
+a fresh replica can serve as soon as the swap is done.
+
+    python -m app.services.snapshot create --output ./data/snapshots
+    python -m app.services.snapshot restore ./data/snapshots/snapshot-20240101T000000.tar
+
+Run ``create`` from the CLI only while the API is stopped; use the
+``/snapshots/`` endpoint to snapshot a running server.
+"""
+from typing import List, Dict, Any, NamedTuple, Optional
+from datetime import datetime
+from pathlib import Path
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import time
+
+from ..core.config import settings
+from ..core.logger import logger
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class SnapshotFile(NamedTuple):
+    """A file a store contributes to a snapshot.
+
+    ``immutable`` files are never modified in place (written once or replaced
+    atomically) and can be hard-linked; ``length`` cuts append-only files at
+    the size they had when the snapshot was taken.
+    """
+    name: str
+    path: Path
+    immutable: bool
+    length: Optional[int] = None
+
+
+def _sqlite_path() -> Path:
+    return Path(settings.SQLITE_URL.replace("sqlite:///", "", 1))
+
+
+def _vector_store_path() -> Path:
+    if settings.VECTOR_STORE_BACKEND == "faiss":
+        return Path(settings.FAISS_INDEX_PATH)
+    return Path(settings.VECTOR_STORE_PATH)
+
+
+def _stage(file: SnapshotFile, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if file.immutable:
+        try:
+            os.link(file.path, dest)
+            return
+        except OSError:
+            pass  # Different filesystem: fall back to a copy
+    shutil.copy2(file.path, dest)
+
+
+def _sha256(path: Path, length: Optional[int]) -> str:
+    digest = hashlib.sha256()
+    remaining = length if length is not None else path.stat().st_size
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def create_snapshot(pipeline, output_dir: Optional[Path] = None, compress: bool = False) -> Path:
+    """Take a consistent snapshot of ``pipeline``'s stores and the database."""
+    output_dir = Path(output_dir or settings.SNAPSHOT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    name = f"snapshot-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
+    staging = output_dir / f".staging-{name}"
+    files: List[Dict[str, Any]] = []
+
+    started = time.perf_counter()
+    with pipeline.write_lock:
+        locked_at = time.perf_counter()
+        # The store locks also keep background merges and checkpoints from
+        # deleting files between listing and linking them
+        with pipeline.chunk_store.locked():
+            for file in pipeline.chunk_store.snapshot_files():
+                _stage(file, staging / "chunks" / file.name)
+                files.append({"name": f"chunks/{file.name}", "length": file.length})
+        with pipeline.vector_store.locked():
+            for file in pipeline.vector_store.snapshot_files():
+                _stage(file, staging / "vectors" / file.name)
+                files.append({"name": f"vectors/{file.name}", "length": file.length})
+
+        # The SQLite backup API gives a consistent copy while other connections stay open
+        db_path = _sqlite_path()
+        if db_path.exists():
+            (staging / "db").mkdir(parents=True, exist_ok=True)
+            source = sqlite3.connect(str(db_path))
+            target = sqlite3.connect(str(staging / "db" / db_path.name))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            files.append({"name": f"db/{db_path.name}", "length": None})
+
+        counts = {
+            "chunks": len(pipeline.chunk_store),
+            "vectors": pipeline.vector_store.count(),
+            "documents": pipeline.chunk_store.document_count(),
+        }
+    lock_ms = (time.perf_counter() - locked_at) * 1000
+
+    # Everything below runs without the lock
+    for entry in files:
+        path = staging / entry["name"]
+        entry["size"] = entry["length"] if entry["length"] is not None else path.stat().st_size
+        entry["sha256"] = _sha256(path, entry["length"])
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "app_version": settings.VERSION,
+        "vector_backend": settings.VECTOR_STORE_BACKEND,
+        "faiss_index_type": settings.FAISS_INDEX_TYPE if settings.VECTOR_STORE_BACKEND == "faiss" else None,
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "embedding_dim": settings.EMBEDDING_DIM,
+        "db_file": _sqlite_path().name,
+        "counts": counts,
+        "files": files,
+    }
+    manifest_path = staging / "snapshot.json"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    archive_path = output_dir / f"{name}.tar{'.gz' if compress else ''}"
+    tmp_archive = archive_path.with_name(archive_path.name + ".tmp")
+    try:
+        with tarfile.open(tmp_archive, "w:gz" if compress else "w") as tar:
+            # Manifest first so restores can validate before extracting anything
+            tar.add(manifest_path, arcname="snapshot.json")
+            for entry in files:
+                info = tarfile.TarInfo(entry["name"])
+                info.size = entry["size"]
+                info.mtime = int(time.time())
+                with open(staging / entry["name"], "rb") as f:
+                    tar.addfile(info, f)
+        os.replace(tmp_archive, archive_path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+        tmp_archive.unlink(missing_ok=True)
+
+    logger.info(
+        f"Snapshot {archive_path} written in {time.perf_counter() - started:.1f}s "
+        f"(ingest paused {lock_ms:.0f}ms): {counts}"
+    )
+    return archive_path
+
+
+def read_manifest(archive_path: Path) -> Dict[str, Any]:
+    with tarfile.open(archive_path) as tar:
+        return json.load(tar.extractfile("snapshot.json"))
+
+
+def restore_snapshot(archive_path: Path, verify: bool = False) -> Dict[str, Any]:
+    """Replace the local retrieval state with a snapshot.
+
+    Must run before the pipeline opens its stores. Sizes are always checked;
+    ``verify`` also checks SHA-256 checksums.
+    """
+    archive_path = Path(archive_path)
+    started = time.perf_counter()
+    manifest = read_manifest(archive_path)
+
+    if manifest["format_version"] != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest['format_version']}")
+    if manifest["vector_backend"] != settings.VECTOR_STORE_BACKEND:
+        raise ValueError(
+            f"Snapshot uses the {manifest['vector_backend']} vector backend, "
+            f"configured {settings.VECTOR_STORE_BACKEND}"
+        )
+    if manifest["embedding_model"] != settings.EMBEDDING_MODEL:
+        raise ValueError(f"Snapshot was built with {manifest['embedding_model']}, configured {settings.EMBEDDING_MODEL}")
+
+    restore_dir = Path(settings.SNAPSHOT_DIR) / f".restore-{archive_path.name}"
+    shutil.rmtree(restore_dir, ignore_errors=True)
+    restore_dir.mkdir(parents=True)
+    try:
+        with tarfile.open(archive_path) as tar:
+            expected = {entry["name"] for entry in manifest["files"]} | {"snapshot.json"}
+            members = [member for member in tar.getmembers() if member.name in expected]
+            tar.extractall(restore_dir, members=members, filter="data")
+
+        for entry in manifest["files"]:
+            path = restore_dir / entry["name"]
+            if not path.exists() or path.stat().st_size != entry["size"]:
+                raise ValueError(f"Snapshot file {entry['name']} is missing or truncated")
+            if verify and _sha256(path, None) != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch for {entry['name']}")
+
+        targets = {
+            restore_dir / "chunks": Path(settings.CHUNK_STORE_PATH),
+            restore_dir / "vectors": _vector_store_path(),
+        }
+        for source, target in targets.items():
+            source.mkdir(exist_ok=True)
+            _swap_in(source, target)
+
+        db_file = restore_dir / "db" / manifest["db_file"]
+        if db_file.exists():
+            db_path = _sqlite_path()
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(db_file), str(db_path.with_name(db_path.name + ".restore")))
+            os.replace(db_path.with_name(db_path.name + ".restore"), db_path)
+    finally:
+        shutil.rmtree(restore_dir, ignore_errors=True)
+
+    logger.info(
+        f"Restored snapshot {archive_path.name} from {manifest['created_at']} "
+        f"in {time.perf_counter() - started:.1f}s: {manifest['counts']}"
+    )
+    return manifest
+
+
+def _swap_in(source: Path, target: Path):
+    """Move a restored directory into place, keeping the old one until it succeeds."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staged = target.with_name(target.name + ".restore")
+    shutil.rmtree(staged, ignore_errors=True)
+    shutil.move(str(source), str(staged))
+
+    old = target.with_name(target.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if target.exists():
+        os.rename(target, old)
+    os.rename(staged, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def latest_snapshot(path: Path) -> Optional[Path]:
+    """Return ``path`` itself, or the newest snapshot archive inside a directory."""
+    if path.is_file():
+        return path
+    archives = sorted(path.glob("snapshot-*.tar*"))
+    archives = [archive for archive in archives if not archive.name.endswith(".tmp")]
+    return archives[-1] if archives else None
+
+
+def warm_start():
+    """Restore ``SNAPSHOT_RESTORE_PATH`` on a fresh node before the stores open.
+
+    Skipped when the node already has a chunk store. A file lock makes sure
+    only one worker process restores; the others wait and then find the data.
+    """
+    if not settings.SNAPSHOT_RESTORE_PATH:
+        return
+
+    snapshot_dir = Path(settings.SNAPSHOT_DIR)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_dir / ".restore.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if (Path(settings.CHUNK_STORE_PATH) / "manifest.json").exists():
+                return
+            archive = latest_snapshot(Path(settings.SNAPSHOT_RESTORE_PATH))
+            if archive is None:
+                logger.warning(f"No snapshot found at {settings.SNAPSHOT_RESTORE_PATH}, starting empty")
+                return
+            restore_snapshot(archive)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot and restore the retrieval state")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="Snapshot a stopped server's data")
+    create_parser.add_argument("--output", type=Path, default=None)
+    create_parser.add_argument("--gzip", action="store_true")
+
+    restore_parser = subparsers.add_parser("restore", help="Replace local data with a snapshot")
+    restore_parser.add_argument("archive", type=Path)
+    restore_parser.add_argument("--verify", action="store_true", help="Check SHA-256 checksums")
+
+    args = parser.parse_args()
+    if args.command == "create":
+        from .rag_pipeline import get_rag_pipeline
+
+        print(create_snapshot(get_rag_pipeline(), args.output, compress=args.gzip))
+    else:
+        archive = latest_snapshot(args.archive)
+        if archive is None:
+            parser.error(f"No snapshot found at {args.archive}")
+        print(json.dumps(restore_snapshot(archive, verify=args.verify)["counts"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+from typing import List, Iterator, Iterable, NamedTuple, Optional, Tuple, Union
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+import ast
+import codecs
+import hashlib
+import mmap
+import threading
+
+from ..core.config import settings
+from ..core.logger import logger
+from ..models.document import DocumentChunk, ChunkType
+
+# Bytes decoded per step; also the longest piece of a line held before it is chunked
+READ_WINDOW = 1024 * 1024
+
+
+class SourceSpan(NamedTuple):
+    kind: str  # "module", "function", "class" or "method"
+    name: Optional[str]
+    start: int  # 1-based, inclusive
+    end: int
+
+
+class TextLoader:
+    """Streaming chunker for plain text and Python source.
+
+    Files are memory-mapped and decoded incrementally, and chunks are yielded
+    as lines are read, so a large log never exists in memory as one string.
+    Python files are split along top-level functions and classes (classes too
+    large for one chunk along their methods); the spans are cached by the
+    SHA-256 of the file, so unchanged files are not parsed again.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, cache_size: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.TEXT_CHUNK_SIZE
+        self.cache_size = cache_size or settings.SOURCE_PARSE_CACHE_SIZE
+        self._cache: "OrderedDict[str, List[SourceSpan]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def iter_text(self, file_path: Union[str, Path]) -> Iterator[DocumentChunk]:
+        """Yield line-aligned chunks of a text file."""
+        with _map_file(file_path) as buffer:
+            for text, line_start, line_end in self._pack_lines(_iter_lines(buffer)):
+                yield DocumentChunk(
+                    text=text,
+                    chunk_type=ChunkType.TEXT,
+                    page_num=0,
+                    metadata={"type": "text", "line_start": line_start, "line_end": line_end}
+                )
+
+    def iter_python(self, file_path: Union[str, Path]) -> Iterator[DocumentChunk]:
+        """Yield chunks of a Python file aligned to functions, classes and methods.
+
+        Files that do not parse are chunked by lines like plain text.
+        """
+        with _map_file(file_path) as buffer:
+            spans = self.python_spans(buffer)
+            starts = [span.start for span in spans]
+            for text, line_start, line_end in self._pack_lines(_iter_lines(buffer), set(starts)):
+                metadata = {"type": "python", "line_start": line_start, "line_end": line_end}
+                if spans:
+                    span = spans[bisect_right(starts, line_start) - 1]
+                    metadata.update({"kind": span.kind, "name": span.name})
+                yield DocumentChunk(text=text, chunk_type=ChunkType.CODE, page_num=0, metadata=metadata)
+
+    def python_spans(self, buffer: Union[bytes, mmap.mmap]) -> List[SourceSpan]:
+        """Top-level spans of Python source covering every line, cached by content hash."""
+        content_hash = hashlib.sha256(buffer).hexdigest()
+        with self._lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+                return cached
+
+        # The AST needs the whole source, but only the spans outlive this call
+        source = bytes(buffer)
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError) as e:
+            logger.warning(f"Cannot parse Python source, chunking by lines: {e}")
+            spans: List[SourceSpan] = []
+        else:
+            line_sizes = [len(line) + 1 for line in source.split(b"\n")]
+            last_line = len(line_sizes) - 1 if source.endswith(b"\n") else len(line_sizes)
+            spans = self._body_spans(tree.body, 1, max(last_line, 1), "", line_sizes)
+
+        with self._lock:
+            self._cache[content_hash] = spans
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return spans
+
+    def _body_spans(
+        self,
+        body: List[ast.stmt],
+        first: int,
+        last: int,
+        prefix: str,
+        line_sizes: List[int]
+    ) -> List[SourceSpan]:
+        # Lines between definitions (comments, decorators) go with the next one;
+        # runs of other statements are grouped into one span
+        group_kind, group_name = ("class", prefix[:-1]) if prefix else ("module", None)
+        spans: List[SourceSpan] = []
+        previous_end = first - 1
+        for node in body:
+            start, end = previous_end + 1, max(node.end_lineno, previous_end + 1)
+            previous_end = end
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = prefix + node.name
+                if isinstance(node, ast.ClassDef):
+                    if sum(line_sizes[start - 1:end]) > self.chunk_size:
+                        spans.extend(self._body_spans(node.body, start, end, name + ".", line_sizes))
+                        continue
+                    kind = "class"
+                else:
+                    kind = "method" if prefix else "function"
+                spans.append(SourceSpan(kind, name, start, end))
+            elif spans and spans[-1].kind == group_kind and spans[-1].name == group_name:
+                spans[-1] = spans[-1]._replace(end=end)
+            else:
+                spans.append(SourceSpan(group_kind, group_name, start, end))
+
+        if not spans:
+            return [SourceSpan(group_kind, group_name, first, last)]
+        spans[-1] = spans[-1]._replace(end=last)
+        return spans
+
+    def _pack_lines(self, pieces: Iterable[str], breaks: Iterable[int] = ()) -> Iterator[Tuple[str, int, int]]:
+        """Group lines into ``(text, line_start, line_end)`` chunks of at most ``chunk_size`` characters.
+
+        A chunk also ends before every line number in ``breaks``; a single line
+        longer than ``chunk_size`` is cut into several chunks. Blank chunks are
+        dropped.
+        """
+        breaks = set(breaks)
+        buffer: List[str] = []
+        size = 0
+        line = start = 1
+        at_line_start = True
+
+        for piece in pieces:
+            if buffer and ((at_line_start and line in breaks) or size + len(piece) > self.chunk_size):
+                text = "".join(buffer)
+                if text.strip():
+                    yield text, start, line - 1 if at_line_start else line
+                buffer, size, start = [], 0, line
+            while len(piece) > self.chunk_size:
+                if piece[:self.chunk_size].strip():
+                    yield piece[:self.chunk_size], line, line
+                piece = piece[self.chunk_size:]
+                start = line
+
+            buffer.append(piece)
+            size += len(piece)
+            at_line_start = piece.endswith("\n")
+            if at_line_start:
+                line += 1
+
+        text = "".join(buffer)
+        if text.strip():
+            yield text, start, line - 1 if at_line_start else line
+
+
+class _map_file:
+    """Context manager memory-mapping a file read-only; empty files map to ``b""``."""
+
+    def __init__(self, file_path: Union[str, Path]):
+        self.file_path = file_path
+
+    def __enter__(self) -> Union[bytes, mmap.mmap]:
+        self._file = open(self.file_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self._map = None
+            return b""
+        return self._map
+
+    def __exit__(self, *exc_info):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def _iter_lines(buffer: Union[bytes, mmap.mmap], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode ``buffer`` window by window, yielding lines with their newline.
+
+    A line longer than ``READ_WINDOW`` is yielded in pieces; only the last
+    piece ends with the newline.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for offset in range(0, len(buffer), READ_WINDOW):
+        pending += decoder.decode(buffer[offset:offset + READ_WINDOW])
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for text in lines:
+            yield text + "\n"
+        if len(pending) > READ_WINDOW:
+            yield pending
+            pending = ""
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+text_loader = TextLoader()
@@ -1,8 +1,719 @@
-from langchain.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
-
-def create_vector_store(docs, metadata):
-    embeddings = OpenAIEmbeddings()
-    db = FAISS.from_documents(docs, embeddings)
-    db.add_metadata(metadata)
-    return db
+"""Pluggable vector index used by RAGPipeline.
+
+Backends only store chunk ids and vectors; chunk text and attributes live in
+the chunk store. ``VECTOR_STORE_BACKEND`` selects the implementation:
+
+- ``chroma``: the persistent Chroma collection (HNSW, float32).
+- ``faiss``: a local FAISS index (flat, HNSW, IVF-PQ or scalar-quantized) with
+  exact re-scoring of the top candidates against the original vectors.
+"""
+from typing import List, Dict, Any, ContextManager, Optional, Sequence, Tuple
+from abc import ABC, abstractmethod
+from pathlib import Path
+import contextlib
+import json
+import os
+import threading
+import uuid
+import numpy as np
+
+from ..core.config import settings
+from ..core.logger import logger
+from .locks import InterProcessLock, file_stamp
+
+# Stores smaller than this are not rebuilt for deleted vectors below max_tombstone_ratio of it
+MIN_REBUILD_VECTORS = 10_000
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def add(self, ids: List[str], embeddings: Sequence[Sequence[float]]):
+        """Add vectors under the given chunk ids."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove vectors by chunk id; unknown ids are ignored."""
+
+    @abstractmethod
+    def search(self, embeddings: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        """Return ``(chunk_id, similarity)`` pairs per query, best first."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of live vectors."""
+
+    def persist(self):
+        """Flush in-memory state to disk, for backends that need it."""
+
+    def locked(self) -> ContextManager:
+        """Context in which no process writes to the store; hold it while using ``snapshot_files``."""
+        return contextlib.nullcontext()
+
+    @abstractmethod
+    def snapshot_files(self) -> List["SnapshotFile"]:
+        """Files making up the current on-disk state, for index snapshots.
+
+        Called with pipeline writes paused and ``locked()`` held, so no write is in flight.
+        """
+
+    # Chunks indexed before the chunk store kept text and metadata in the
+    # vector store; only the Chroma backend can have any.
+
+    def legacy_chunks(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def legacy_document_chunks(self, doc_id: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        return []
+
+    def legacy_delete_document(self, doc_id: str):
+        pass
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, path: Optional[str] = None):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        from chromadb.utils import embedding_functions
+
+        self.path = Path(path or settings.VECTOR_STORE_PATH)
+        client = chromadb.PersistentClient(
+            path=str(self.path),
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        self.collection = client.get_or_create_collection(
+            name="document_store",
+            embedding_function=embedding_functions.DefaultEmbeddingFunction(),
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids: List[str], embeddings: Sequence[Sequence[float]]):
+        if ids:
+            self.collection.add(ids=ids, embeddings=[list(e) for e in embeddings])
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def search(self, embeddings: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        results = self.collection.query(
+            query_embeddings=[list(e) for e in embeddings],
+            n_results=k,
+            include=["distances"]
+        )
+        # Cosine distance -> similarity
+        return [
+            [(chunk_id, 1.0 - distance) for chunk_id, distance in zip(ids, distances)]
+            for ids, distances in zip(results["ids"], results["distances"])
+        ]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def snapshot_files(self) -> List["SnapshotFile"]:
+        from .snapshot import SnapshotFile
+
+        # Chroma updates its SQLite and HNSW files in place, so they are copied
+        return [
+            SnapshotFile(str(f.relative_to(self.path)), f, immutable=False)
+            for f in sorted(self.path.rglob("*")) if f.is_file()
+        ]
+
+    def legacy_chunks(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        chunks = {}
+        for chunk_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+            if document is None:
+                continue
+            metadata = metadata or {}
+            chunks[chunk_id] = {
+                "id": chunk_id,
+                "text": document,
+                "doc_id": metadata.get("doc_id"),
+                "page_num": metadata.get("page_num"),
+                "chunk_type": metadata.get("chunk_type")
+            }
+        return chunks
+
+    def legacy_document_chunks(self, doc_id: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        results = self.collection.get(where={"doc_id": doc_id}, include=["documents", "metadatas"])
+        return list(zip(results["ids"], results["documents"], results["metadatas"]))
+
+    def legacy_delete_document(self, doc_id: str):
+        self.collection.delete(where={"doc_id": doc_id})
+
+
+class _RawVectors:
+    """Append-only float32 matrix on disk, memory-mapped for exact re-scoring.
+
+    Rows are allocated from the file size, so appends must hold the store's
+    file lock; readers only touch rows that were logged, hence complete.
+    Deleted rows are only reclaimed by writing a new file (see ``FaissVectorStore._rebuild``).
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.row_bytes = 4 * dim
+        self.path.touch(exist_ok=True)
+        self.rows = 0
+        self._map: Optional[np.memmap] = None
+        self.refresh()
+
+    def refresh(self):
+        self.rows = self.path.stat().st_size // self.row_bytes
+
+    def append(self, vectors: np.ndarray) -> int:
+        # Written after the last complete row, overwriting any torn tail
+        start = self.path.stat().st_size // self.row_bytes
+        with open(self.path, "r+b") as f:
+            f.seek(start * self.row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.rows = start + len(vectors)
+        return start
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        mapped = self._map
+        if mapped is None or len(mapped) < self.rows:
+            mapped = self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return np.asarray(mapped[rows])
+
+
+class FaissVectorStore(VectorStore):
+    """Local FAISS index with quantization and exact re-scoring.
+
+    Vectors are L2-normalized and compared by inner product (cosine). The
+    original float32 vectors are kept in a memory-mapped file, so quantized
+    indexes only need their codes in RAM; the top ``k * rerank_factor``
+    candidates are re-scored exactly from that file.
+
+    Writes append the vectors and one line to an operation log under a file
+    lock, so several processes (uvicorn workers) can share the store: each
+    replays the log lines written by the others before searching. The index
+    itself is checkpointed every ``checkpoint_every`` logged vectors, on
+    shutdown, or via ``persist()``, and the log restarts after each checkpoint.
+
+    Index types needing training (``sq8``, ``ivfpq``, ``ivfsq8``) serve from an exact
+    staging index until ``train_min_vectors`` vectors exist, then train on a
+    sample and rebuild. Deleted vectors stay in the raw file (and in HNSW
+    indexes, which cannot remove them), so once they exceed
+    ``max_tombstone_ratio`` of the live ones the index is rebuilt from a new
+    raw file holding only the live vectors. Both run in a background thread
+    on a new index that is swapped in when done, so searches are never
+    blocked; ``train()`` can also be called explicitly, e.g. after a bulk load.
+
+    Layout under ``FAISS_INDEX_PATH``::
+
+        meta.json            # current checkpoint: index file, log, raw file, id map
+        index-000001.faiss   # index as of the checkpoint
+        ops-000001.log       # operations since the checkpoint, JSON lines
+        vectors-<id>.f32     # raw vectors, append-only; a new file per rebuild
+        .lock                # writer lock
+    """
+
+    TRAINED_TYPES = ("sq8", "ivfpq", "ivfsq8")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dim: Optional[int] = None,
+        index_type: Optional[str] = None,
+        nlist: Optional[int] = None,
+        pq_m: Optional[int] = None,
+        pq_bits: Optional[int] = None,
+        hnsw_m: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank_factor: Optional[int] = None,
+        train_min_vectors: Optional[int] = None,
+        mmap: Optional[bool] = None,
+        checkpoint_every: Optional[int] = None,
+        max_tombstone_ratio: Optional[float] = None
+    ):
+        import faiss
+
+        self.faiss = faiss
+        self.path = Path(path or settings.FAISS_INDEX_PATH)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim or settings.EMBEDDING_DIM
+        self.index_type = index_type or settings.FAISS_INDEX_TYPE
+        self.nlist = nlist or settings.FAISS_NLIST
+        self.pq_m = pq_m or settings.FAISS_PQ_M
+        self.pq_bits = pq_bits or settings.FAISS_PQ_BITS
+        self.hnsw_m = hnsw_m or settings.FAISS_HNSW_M
+        self.nprobe = nprobe or settings.FAISS_NPROBE
+        self.ef_search = ef_search or settings.FAISS_EF_SEARCH
+        self.rerank_factor = rerank_factor or settings.FAISS_RERANK_FACTOR
+        self.train_min_vectors = train_min_vectors or settings.FAISS_TRAIN_MIN_VECTORS
+        self.mmap = settings.FAISS_MMAP_INDEX if mmap is None else mmap
+        self.checkpoint_every = checkpoint_every or settings.FAISS_CHECKPOINT_EVERY
+        self.max_tombstone_ratio = max_tombstone_ratio or settings.FAISS_MAX_TOMBSTONE_RATIO
+        self._file_lock = InterProcessLock(self.path / ".lock")  # Writers, across processes
+        self._lock = threading.RLock()  # In-memory index
+        self._maintainer: Optional[threading.Thread] = None
+        self._backlog: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None  # Changes during a rebuild
+
+        self.raw: Optional[_RawVectors] = None  # Opened with the checkpoint naming it
+        self._meta_stamp = None
+        with self._file_lock:
+            self._sync()
+            if self._meta_stamp is None:
+                self._checkpoint()
+
+    # -- Index construction --------------------------------------------------
+
+    def _new_index(self, trained: bool):
+        faiss = self.faiss
+        if self.index_type in self.TRAINED_TYPES and not trained:
+            # Exact staging index until there is enough data to train on
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+
+        if self.index_type == "flat":
+            inner = faiss.IndexFlatIP(self.dim)
+        elif self.index_type == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "sq8":
+            inner = faiss.IndexScalarQuantizer(self.dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "ivfpq":
+            # IVF indexes store ids natively; wrapping them in an id map breaks remove_ids
+            quantizer = faiss.IndexFlatIP(self.dim)
+            return faiss.IndexIVFPQ(quantizer, self.dim, self.nlist, self.pq_m, self.pq_bits, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "ivfsq8":
+            quantizer = faiss.IndexFlatIP(self.dim)
+            return faiss.IndexIVFScalarQuantizer(
+                quantizer, self.dim, self.nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type}")
+        # IndexIDMap2 keeps the id mapping inside the index file
+        return faiss.IndexIDMap2(inner)
+
+    def _inner_index(self, index=None):
+        index = self.index if index is None else index
+        if isinstance(index, self.faiss.IndexIDMap):
+            return self.faiss.downcast_index(index.index)
+        return self.faiss.downcast_index(index)
+
+    def _is_hnsw(self, index=None) -> bool:
+        return isinstance(self._inner_index(index), self.faiss.IndexHNSW)
+
+    @property
+    def trained(self) -> bool:
+        return self._trained
+
+    def train(self, sample_size: Optional[int] = None):
+        """Train the quantizer on a sample of stored vectors and swap in the rebuilt index."""
+        if not self._rebuild(train=True, sample_size=sample_size):
+            raise RuntimeError("The index changed while training; train again")
+
+    def _rebuild(self, train: bool, sample_size: Optional[int] = None) -> bool:
+        """Build a new index and raw file from the live vectors without holding any lock, then swap them in.
+
+        Live vectors are renumbered into a new raw file, so deleted ones stop
+        taking space. Changes made meanwhile are recorded and replayed onto
+        the new index. Returns False when another process rebuilt the index first.
+        """
+        with self._file_lock:
+            self._sync()
+            with self._lock:
+                live_rows = np.array(sorted(self._row_of.values()), dtype=np.int64)
+                epoch = self._epoch
+                source = self.raw
+                self._backlog = []
+        # Named uniquely, as another process may be rebuilding from the same epoch
+        raw = _RawVectors(self.path / f"vectors-{uuid.uuid4().hex[:12]}.f32", self.dim)
+        swapped = False
+        try:
+            if train and not len(live_rows):
+                raise ValueError("Cannot train an empty index")
+            index = self._new_index(trained=train or self.trained)
+            if train:
+                sample_size = sample_size or max(self.train_min_vectors, 64 * self.nlist)
+                rng = np.random.default_rng(0)
+                sample_rows = live_rows if len(live_rows) <= sample_size else np.sort(
+                    rng.choice(live_rows, sample_size, replace=False)
+                )
+                logger.info(f"Training FAISS {self.index_type} index on {len(sample_rows)} vectors")
+                index.train(source.get(sample_rows))
+
+            new_row_of = {}  # Old row -> row in the new raw file
+            for start in range(0, len(live_rows), 100_000):
+                rows = live_rows[start:start + 100_000]
+                vectors = source.get(rows)
+                first = raw.append(vectors)
+                index.add_with_ids(vectors, np.arange(first, first + len(rows), dtype=np.int64))
+                new_row_of.update(zip(rows.tolist(), range(first, first + len(rows))))
+
+            with self._file_lock:
+                self._sync()
+                with self._lock:
+                    backlog = self._backlog
+                    if backlog is None or self._epoch != epoch:
+                        return False
+                    tombstones: set = set()
+                    for removed, added in backlog:
+                        if len(removed):
+                            removed = np.array([new_row_of.pop(row) for row in removed.tolist()], dtype=np.int64)
+                            if self._is_hnsw(index):
+                                tombstones.update(removed.tolist())
+                            else:
+                                index.remove_ids(removed)
+                        if len(added):
+                            vectors = self.raw.get(added)
+                            first = raw.append(vectors)
+                            index.add_with_ids(vectors, np.arange(first, first + len(added), dtype=np.int64))
+                            new_row_of.update(zip(added.tolist(), range(first, first + len(added))))
+
+                    self.index = index
+                    self.raw = raw
+                    self._row_of = {chunk_id: new_row_of[row] for chunk_id, row in self._row_of.items()}
+                    self._id_of = {row: chunk_id for chunk_id, row in self._row_of.items()}
+                    self._mapped = False
+                    self._tombstones = tombstones
+                    self._trained = self._trained or train
+                    self._epoch += 1
+                    self._configure_search()
+                self._checkpoint()
+                swapped = True
+            logger.info(f"Rebuilt FAISS {self.index_type} index with {len(self._row_of)} vectors")
+            return True
+        finally:
+            with self._lock:
+                self._backlog = None
+            if not swapped:
+                raw.path.unlink(missing_ok=True)
+
+    def _configure_search(self):
+        faiss = self.faiss
+        inner = self._inner_index()
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+        try:
+            faiss.extract_index_ivf(inner).nprobe = self.nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+
+    # -- VectorStore ---------------------------------------------------------
+
+    def add(self, ids: List[str], embeddings: Sequence[Sequence[float]]):
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self._file_lock:
+            self._sync()
+            start = self.raw.append(vectors)
+            operation = {"add": list(ids), "start": start}
+            self._log(operation)
+            with self._lock:
+                self._apply(operation, vectors)
+        self._schedule_maintenance()
+
+    def delete(self, ids: List[str]):
+        with self._file_lock:
+            self._sync()
+            ids = [chunk_id for chunk_id in ids if chunk_id in self._row_of]
+            if not ids:
+                return
+            operation = {"delete": ids}
+            self._log(operation)
+            with self._lock:
+                self._apply(operation)
+        self._schedule_maintenance()
+
+    def search(self, embeddings: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        queries = self._normalize(embeddings)
+        self._refresh()
+        with self._lock:
+            if not self._row_of:
+                return [[] for _ in range(len(queries))]
+
+            # Tombstones are bounded by the HNSW rebuild threshold
+            candidates = k * self.rerank_factor + len(self._tombstones)
+            _, rows = self.index.search(queries, min(candidates, self.index.ntotal))
+
+            results = []
+            for query, query_rows in zip(queries, rows):
+                query_rows = np.array(
+                    [row for row in query_rows if row >= 0 and row not in self._tombstones],
+                    dtype=np.int64
+                )
+                if not len(query_rows):
+                    results.append([])
+                    continue
+                # Exact re-scoring of the candidates against the original vectors
+                scores = self.raw.get(query_rows) @ query
+                order = np.argsort(-scores)[:k]
+                results.append([(self._id_of[int(query_rows[i])], float(scores[i])) for i in order])
+            return results
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._row_of)
+
+    def locked(self) -> InterProcessLock:
+        return self._file_lock
+
+    def snapshot_files(self) -> List["SnapshotFile"]:
+        from .snapshot import SnapshotFile
+
+        with self._file_lock:
+            self._sync()
+            # The checkpoint is never modified in place; the log and raw vectors are append-only
+            return [
+                SnapshotFile("meta.json", self.path / "meta.json", immutable=True),
+                SnapshotFile(self._index_name, self.path / self._index_name, immutable=True),
+                SnapshotFile(self._segment, self.path / self._segment, immutable=True, length=self._offset),
+                SnapshotFile(self.raw.path.name, self.raw.path, immutable=True, length=self.raw.rows * self.raw.row_bytes),
+            ]
+
+    def memory_bytes(self) -> int:
+        """Size of the in-memory index (codes and structures, not raw vectors)."""
+        return len(self.faiss.serialize_index(self.index))
+
+    def persist(self):
+        """Checkpoint the index if anything was logged since the last checkpoint."""
+        with self._file_lock:
+            self._sync()
+            if self._logged:
+                self._checkpoint()
+
+    # -- Internals -----------------------------------------------------------
+
+    def _refresh(self):
+        """Replay operations logged by other processes; two stats per call when nothing changed."""
+        if (file_stamp(self.path / "meta.json") != self._meta_stamp
+                or self._segment_size() != self._offset):
+            with self._file_lock:
+                self._sync()
+
+    def _segment_size(self) -> int:
+        try:
+            return (self.path / self._segment).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _sync(self):
+        # Caller holds the file lock, so the checkpoint and log cannot change meanwhile
+        meta_path = self.path / "meta.json"
+        meta_stamp = file_stamp(meta_path)
+        if meta_stamp is None:
+            if self._meta_stamp is None:
+                self._load_checkpoint({})
+            return
+        if meta_stamp != self._meta_stamp:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["index_type"] != self.index_type or meta["dim"] != self.dim:
+                raise ValueError(
+                    f"FAISS index at {self.path} is {meta['index_type']}/{meta['dim']}d, "
+                    f"configured {self.index_type}/{self.dim}d"
+                )
+            # A mapped index is the old checkpoint itself; mapping the new one is as cheap
+            if self._meta_stamp is not None and not self._mapped and meta.get("epoch", 0) == self._epoch and (
+                meta.get("log") == self._segment or meta.get("previous") == self._segment
+            ):
+                # Another process checkpointed: finish the old log, continue on the new one
+                self._replay()
+                if meta["log"] != self._segment:
+                    self._start_segment(meta)
+            else:
+                self._load_checkpoint(meta)
+            self._meta_stamp = meta_stamp
+        self._replay()
+
+    def _load_checkpoint(self, meta: Dict[str, Any]):
+        raw_name = meta.get("vectors", "vectors.f32")
+        if self.raw is None or raw_name != self.raw.path.name:
+            raw = _RawVectors(self.path / raw_name, self.dim)
+            with self._lock:
+                self.raw = raw
+        self.raw.refresh()
+        index_name = meta.get("index", "index.faiss")
+        if meta:
+            index = self._read_index(self.path / index_name)
+            mapped = self._mapped
+        else:
+            index, mapped = self._new_index(trained=False), False
+
+        with self._lock:
+            self.index = index
+            self._mapped = mapped
+            self._trained = meta.get("trained", self.index_type not in self.TRAINED_TYPES)
+            self._epoch = meta.get("epoch", 0)
+            self._row_of: Dict[str, int] = meta.get("ids", {})
+            self._id_of: Dict[int, str] = {row: chunk_id for chunk_id, row in self._row_of.items()}
+            self._tombstones: set = set(meta.get("tombstones", []))
+            self._start_segment(meta)
+            self._backlog = None  # A rebuild in progress missed these changes
+            self._configure_search()
+
+    def _start_segment(self, meta: Dict[str, Any]):
+        self._checkpoint_number = meta.get("checkpoint", 0)
+        self._index_name = meta.get("index", "index.faiss")
+        self._raw_name = meta.get("vectors", "vectors.f32")
+        self._segment = meta.get("log", "ops-000000.log")
+        (self.path / self._segment).touch()
+        self._previous_segment = meta.get("previous")
+        self._previous_raw = meta.get("previous_vectors")
+        self._offset = 0
+        self._logged = 0  # Vectors added or deleted since the checkpoint
+
+    def _replay(self):
+        size = self._segment_size()
+        if size <= self._offset:
+            return
+        with open(self.path / self._segment, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        data = data[:data.rfind(b"\n") + 1]  # Lines are written whole under the lock
+        self.raw.refresh()
+        with self._lock:
+            for line in data.splitlines():
+                self._apply(json.loads(line))
+        self._offset += len(data)
+
+    def _log(self, operation: Dict[str, Any]):
+        line = (json.dumps(operation) + "\n").encode("utf-8")
+        with open(self.path / self._segment, "ab") as f:
+            f.write(line)
+        self._offset += len(line)
+
+    def _apply(self, operation: Dict[str, Any], vectors: Optional[np.ndarray] = None):
+        self._ensure_writable()
+        if "add" in operation:
+            ids = operation["add"]
+            rows = np.arange(operation["start"], operation["start"] + len(ids), dtype=np.int64)
+            if vectors is None:
+                vectors = self.raw.get(rows)
+            self._remove([chunk_id for chunk_id in ids if chunk_id in self._row_of])
+            self.index.add_with_ids(vectors, rows)
+            for chunk_id, row in zip(ids, rows.tolist()):
+                self._row_of[chunk_id] = row
+                self._id_of[row] = chunk_id
+            if self._backlog is not None:
+                self._backlog.append((np.empty(0, dtype=np.int64), rows))
+        else:
+            ids = operation["delete"]
+            self._remove(ids)
+        self._logged += len(ids)
+
+    def _remove(self, ids: List[str]):
+        rows = [self._row_of.pop(chunk_id) for chunk_id in ids if chunk_id in self._row_of]
+        if not rows:
+            return
+        for row in rows:
+            del self._id_of[row]
+        if self._is_hnsw():
+            # HNSW cannot remove vectors; filter them out at search time
+            self._tombstones.update(rows)
+        else:
+            self.index.remove_ids(np.array(rows, dtype=np.int64))
+        if self._backlog is not None:
+            self._backlog.append((np.array(rows, dtype=np.int64), np.empty(0, dtype=np.int64)))
+
+    def _checkpoint(self):
+        """Write the index and id map, then start a new log; the caller holds the file lock."""
+        number = self._checkpoint_number + 1
+        index_name = f"index-{number:06d}.faiss"
+        segment = f"ops-{number:06d}.log"
+        self.faiss.write_index(self.index, str(self.path / index_name) + ".tmp")
+        os.replace(str(self.path / index_name) + ".tmp", self.path / index_name)
+        (self.path / segment).touch()
+
+        meta = {
+            "trained": self.trained,
+            "index_type": self.index_type,
+            "dim": self.dim,
+            "epoch": self._epoch,
+            "checkpoint": number,
+            "index": index_name,
+            "log": segment,
+            "previous": self._segment,
+            "vectors": self.raw.path.name,
+            # Kept for processes still reading the old raw file, like the previous log
+            "previous_vectors": self._raw_name if self._raw_name != self.raw.path.name else None,
+            "ids": self._row_of,
+            "tombstones": sorted(self._tombstones),
+        }
+        meta_path = self.path / "meta.json"
+        with open(str(meta_path) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(str(meta_path) + ".tmp", meta_path)
+
+        # Processes one checkpoint behind can still finish the previous log
+        stale = [self._index_name, self._previous_segment, self._previous_raw]
+        self._start_segment(meta)
+        self._meta_stamp = file_stamp(meta_path)
+        for name in stale:
+            if name and name != index_name:
+                (self.path / name).unlink(missing_ok=True)
+
+    def _schedule_maintenance(self):
+        with self._lock:
+            if self._maintainer is not None and self._maintainer.is_alive():
+                return
+            if self._maintenance_task() is None:
+                return
+            self._maintainer = threading.Thread(target=self._maintain, name="faiss-maintenance", daemon=True)
+            self._maintainer.start()
+
+    def _maintenance_task(self) -> Optional[str]:
+        if not self.trained and len(self._row_of) >= self.train_min_vectors:
+            return "train"
+        # Deleted vectors still in the raw file, including HNSW tombstones
+        if self.raw.rows - len(self._row_of) > self.max_tombstone_ratio * max(len(self._row_of), MIN_REBUILD_VECTORS):
+            return "rebuild"
+        if self._logged >= self.checkpoint_every:
+            return "checkpoint"
+        return None
+
+    def _maintain(self):
+        try:
+            while True:
+                with self._lock:
+                    task = self._maintenance_task()
+                if task is None:
+                    return
+                if task == "checkpoint":
+                    self.persist()
+                # A trained index is rebuilt by retraining the new one on the live vectors
+                elif not self._rebuild(train=task == "train" or (self.trained and self.index_type in self.TRAINED_TYPES)):
+                    return
+        except Exception as e:
+            logger.error(f"FAISS index maintenance failed: {e}")
+
+    def _read_index(self, index_path: Path):
+        """Read the index, memory-mapping its codes when ``mmap`` is enabled.
+
+        A mapped index starts serving without reading the file into RAM (fast
+        warm start from a snapshot); the first write loads it fully.
+        """
+        self._mapped = False
+        if self.mmap:
+            try:
+                index = self.faiss.read_index(str(index_path), self.faiss.IO_FLAG_MMAP)
+                self._mapped = True
+                return index
+            except RuntimeError as e:
+                logger.warning(f"Cannot memory-map FAISS {self.index_type} index, reading it: {e}")
+        return self.faiss.read_index(str(index_path))
+
+    def _ensure_writable(self):
+        if self._mapped:
+            # Callers hold the file lock, so this is still the current checkpoint
+            self.index = self.faiss.read_index(str(self.path / self._index_name))
+            self._mapped = False
+            self._configure_search()
+
+    def _normalize(self, embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        vectors = np.array(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        self.faiss.normalize_L2(vectors)
+        return vectors
+
+
+def create_vector_store() -> VectorStore:
+    """Build the backend selected by ``VECTOR_STORE_BACKEND``."""
+    if settings.VECTOR_STORE_BACKEND == "faiss":
+        return FaissVectorStore()
+    if settings.VECTOR_STORE_BACKEND == "chroma":
+        return ChromaVectorStore()
+    raise ValueError(f"Unsupported vector store backend: {settings.VECTOR_STORE_BACKEND}")
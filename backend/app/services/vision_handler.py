@@ -1,11 +1,12 @@
 from openai import OpenAI
-import base64
+
+from .image_pipeline import image_pipeline
 
 def analyze_image_with_gpt(image_path: str, query: str):
-    with open(image_path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode()
+    client = OpenAI()
+    image = image_pipeline.prepare_file(image_path)
     response = client.chat.completions.create(
         model="gpt-4-vision-preview",
-        messages=[{"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}, {"type": "text", "text": query}]}]
+        messages=[{"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:{image.media_type};base64,{image.data}"}}, {"type": "text", "text": query}]}]
     )
     return response.choices[0].message.content
@@ -0,0 +1,12 @@
+"""Python client for the Notebook LLM API."""
+from ._common import NotebookAPIError, RetryPolicy, UploadResult
+from .async_client import AsyncNotebookClient
+from .client import NotebookClient
+
+__all__ = [
+    "AsyncNotebookClient",
+    "NotebookAPIError",
+    "NotebookClient",
+    "RetryPolicy",
+    "UploadResult",
+]
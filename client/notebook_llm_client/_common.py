@@ -0,0 +1,123 @@
+"""Pieces shared by the sync and async clients."""
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import random
+
+import httpx
+
+DEFAULT_BASE_URL = "http://localhost:8000/api/v1"
+
+# Retried for every request: the server did not process it
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Errors raised before the request reached the server; anything later (a read
+# timeout, a dropped connection) may follow a request the server processed
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+FileInput = Union[str, Path, BinaryIO, Tuple[str, BinaryIO]]
+
+
+class NotebookAPIError(Exception):
+    """An error response from the API."""
+
+    def __init__(self, status_code: int, detail: Any, retry_after: Optional[float] = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@dataclass
+class UploadResult:
+    """Outcome of one file in a multi-file upload."""
+    filename: str
+    document_id: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter; ``Retry-After`` wins when the server sends it."""
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+def client_kwargs(
+    base_url: str,
+    token: Optional[str],
+    timeout: float,
+    max_connections: int
+) -> Dict[str, Any]:
+    """Keep-alive pool settings common to both clients.
+
+    The API reads the JWT from the ``token`` query parameter, so it is sent
+    with every request rather than as a header.
+    """
+    return {
+        "base_url": base_url.rstrip("/"),
+        "params": {"token": token} if token else None,
+        "timeout": httpx.Timeout(timeout, connect=10.0),
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0
+        ),
+        "headers": {"User-Agent": "notebook-llm-client/0.1"},
+    }
+
+
+def open_file(file: FileInput) -> Tuple[str, BinaryIO, bool]:
+    """Return ``(filename, stream, owned)``; owned streams are closed by the caller."""
+    if isinstance(file, (str, Path)):
+        path = Path(file)
+        return path.name, open(path, "rb"), True
+    if isinstance(file, tuple):
+        filename, stream = file
+        return filename, stream, False
+    return Path(getattr(file, "name", "upload")).name, file, False
+
+
+def filename_of(file: FileInput) -> str:
+    if isinstance(file, tuple):
+        return file[0]
+    return Path(getattr(file, "name", file if isinstance(file, (str, Path)) else "upload")).name
+
+
+def retry_after_of(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def raise_for_status(response: httpx.Response):
+    """Raise ``NotebookAPIError`` for error responses; the body must already be read."""
+    if response.is_success:
+        return
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    raise NotebookAPIError(response.status_code, detail, retry_after_of(response))
+
+
+def parse_event(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one NDJSON line; error lines become ``NotebookAPIError``."""
+    if not line.strip():
+        return None
+    event = json.loads(line)
+    if event.get("type") == "error" or ("error" in event and "index" not in event):
+        raise NotebookAPIError(429 if "retry_after" in event else 500, event["error"], event.get("retry_after"))
+    return event
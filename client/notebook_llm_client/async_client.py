@@ -0,0 +1,183 @@
+"""Asynchronous client."""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+import asyncio
+
+import httpx
+
+from ._common import (
+    DEFAULT_BASE_URL, RETRY_STATUSES, UNSENT_ERRORS, FileInput, NotebookAPIError, RetryPolicy, UploadResult,
+    client_kwargs, filename_of, open_file, parse_event, raise_for_status, retry_after_of
+)
+
+
+class AsyncNotebookClient:
+    """asyncio counterpart of ``NotebookClient`` with the same methods.
+
+        async with AsyncNotebookClient(token=token) as client:
+            results = await client.upload_many(paths, max_concurrency=8)
+            async for text in client.iter_answer("Summarize the results"):
+                print(text, end="")
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        token: Optional[str] = None,
+        timeout: float = 120.0,
+        max_connections: int = 10,
+        retry: Optional[RetryPolicy] = None
+    ):
+        self.retry = retry or RetryPolicy()
+        self._http = httpx.AsyncClient(**client_kwargs(base_url, token, timeout, max_connections))
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def __aenter__(self) -> "AsyncNotebookClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # -- Documents -----------------------------------------------------------
+
+    async def upload(self, file: FileInput) -> str:
+        """Upload a path or binary stream and return the new document id.
+
+        The multipart body is streamed from the file; see ``NotebookClient.upload``.
+        """
+        async def send() -> httpx.Response:
+            filename, stream, owned = open_file(file)
+            start = stream.tell() if stream.seekable() else None
+            try:
+                return await self._http.post("/documents/upload/", files={"file": (filename, stream)})
+            finally:
+                if owned:
+                    stream.close()
+                elif start is not None:
+                    stream.seek(start)
+
+        return (await self._request(send, retry_statuses={429}, retry_errors=UNSENT_ERRORS))["document_id"]
+
+    async def upload_many(
+        self,
+        files: Sequence[FileInput],
+        max_concurrency: int = 4,
+        on_result: Optional[Callable[[UploadResult], None]] = None
+    ) -> List[UploadResult]:
+        """Upload files concurrently, at most ``max_concurrency`` at once, results in input order."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def upload_one(file: FileInput) -> UploadResult:
+            result = UploadResult(filename_of(file))
+            async with semaphore:
+                try:
+                    result.document_id = await self.upload(file)
+                except Exception as e:
+                    result.error = e
+            if on_result:
+                on_result(result)
+            return result
+
+        return list(await asyncio.gather(*(upload_one(file) for file in files)))
+
+    async def list_documents(self) -> List[Dict[str, Any]]:
+        return await self._request(lambda: self._http.get("/documents/documents/"))
+
+    async def get_document(self, document_id: str) -> Dict[str, Any]:
+        return await self._request(lambda: self._http.get(f"/documents/documents/{document_id}"))
+
+    async def delete_document(self, document_id: str):
+        await self._request(lambda: self._http.delete(f"/documents/documents/{document_id}"))
+
+    # -- Queries -------------------------------------------------------------
+
+    async def query(self, query: str, image_data: Optional[str] = None) -> Dict[str, Any]:
+        params = {"query": query}
+        if image_data:
+            params["image_data"] = image_data
+        return await self._request(lambda: self._http.post("/documents/query/", params=params))
+
+    def stream_query(self, query: str, image_data: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Ask a question, yielding ``token`` events as the answer is generated, then ``done``."""
+        return self._stream("/documents/query/stream/", {"query": query, "image_data": image_data})
+
+    async def iter_answer(self, query: str, image_data: Optional[str] = None) -> AsyncIterator[str]:
+        async for event in self.stream_query(query, image_data):
+            if event["type"] == "token":
+                yield event["text"]
+
+    async def batch_query(self, queries: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        payload = {"queries": queries, "max_concurrency": max_concurrency}
+        return (await self._request(lambda: self._http.post("/documents/query/batch/", json=payload)))["results"]
+
+    def iter_batch_query(
+        self,
+        queries: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        payload = {"queries": queries, "max_concurrency": max_concurrency, "stream": True}
+        return self._stream("/documents/query/batch/", payload)
+
+    # -- Conversations -------------------------------------------------------
+
+    async def create_session(self) -> str:
+        return (await self._request(lambda: self._http.post("/queries/sessions/")))["session_id"]
+
+    async def send_message(self, session_id: str, question: str) -> Dict[str, Any]:
+        return await self._request(lambda: self._http.post(
+            f"/queries/sessions/{session_id}/messages", json={"question": question}
+        ), retry_errors=UNSENT_ERRORS)  # A processed turn retried would be appended twice
+
+    async def delete_session(self, session_id: str):
+        await self._request(lambda: self._http.delete(f"/queries/sessions/{session_id}"))
+
+    # -- Internals -----------------------------------------------------------
+
+    async def _request(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        retry_statuses=RETRY_STATUSES,
+        retry_errors=(httpx.TransportError,)
+    ) -> Any:
+        """Send with retries; requests that must not run twice pass ``retry_errors=UNSENT_ERRORS``."""
+        attempt = 0
+        while True:
+            try:
+                response = await send()
+            except retry_errors:
+                if attempt >= self.retry.max_retries:
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in retry_statuses and attempt < self.retry.max_retries:
+                await asyncio.sleep(self.retry.delay(attempt, retry_after_of(response)))
+                attempt += 1
+                continue
+
+            raise_for_status(response)
+            return response.json() if response.content else None
+
+    async def _stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._http.stream("POST", path, json=payload) as response:
+                    if not response.is_success:
+                        await response.aread()
+                        raise_for_status(response)
+                    async for line in response.aiter_lines():
+                        event = parse_event(line)
+                        if event is not None:
+                            started = True
+                            yield event
+                return
+            except (httpx.TransportError, NotebookAPIError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.status_code in RETRY_STATUSES
+                if started or not retryable or attempt >= self.retry.max_retries:
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt, getattr(e, "retry_after", None)))
+                attempt += 1
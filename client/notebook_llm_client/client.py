@@ -0,0 +1,195 @@
+"""Synchronous client."""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import httpx
+
+from ._common import (
+    DEFAULT_BASE_URL, RETRY_STATUSES, UNSENT_ERRORS, FileInput, NotebookAPIError, RetryPolicy, UploadResult,
+    client_kwargs, filename_of, open_file, parse_event, raise_for_status, retry_after_of
+)
+
+
+class NotebookClient:
+    """Client for the Notebook LLM API over one keep-alive connection pool.
+
+    Thread-safe: share one instance per process. Failed requests are retried
+    with backoff on connection errors and 429/502/503/504 responses.
+
+        with NotebookClient(token=token) as client:
+            doc_id = client.upload("paper.pdf")
+            for event in client.stream_query("What are the key findings?"):
+                print(event.get("text", ""), end="")
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        token: Optional[str] = None,
+        timeout: float = 120.0,
+        max_connections: int = 10,
+        retry: Optional[RetryPolicy] = None
+    ):
+        self.retry = retry or RetryPolicy()
+        self._http = httpx.Client(**client_kwargs(base_url, token, timeout, max_connections))
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self) -> "NotebookClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -- Documents -----------------------------------------------------------
+
+    def upload(self, file: FileInput) -> str:
+        """Upload a path or binary stream and return the new document id.
+
+        The file is streamed from disk in the multipart body, never read into
+        memory. Uploads are only retried when the server rejected them before
+        processing (connection errors and 429).
+        """
+        def send() -> httpx.Response:
+            filename, stream, owned = open_file(file)
+            start = stream.tell() if stream.seekable() else None
+            try:
+                return self._http.post("/documents/upload/", files={"file": (filename, stream)})
+            finally:
+                if owned:
+                    stream.close()
+                elif start is not None:
+                    stream.seek(start)  # Rewind for a retry
+
+        return self._request(send, retry_statuses={429}, retry_errors=UNSENT_ERRORS)["document_id"]
+
+    def upload_many(
+        self,
+        files: Sequence[FileInput],
+        max_concurrency: int = 4,
+        on_result: Optional[Callable[[UploadResult], None]] = None
+    ) -> List[UploadResult]:
+        """Upload files in parallel over the shared pool, at most ``max_concurrency`` at once.
+
+        Returns one result per file, in input order; a failed file does not
+        stop the others. ``on_result`` is called as each upload finishes.
+        """
+        def upload_one(file: FileInput) -> UploadResult:
+            result = UploadResult(filename_of(file))
+            try:
+                result.document_id = self.upload(file)
+            except Exception as e:
+                result.error = e
+            if on_result:
+                on_result(result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            return list(executor.map(upload_one, files))
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        return self._request(lambda: self._http.get("/documents/documents/"))
+
+    def get_document(self, document_id: str) -> Dict[str, Any]:
+        return self._request(lambda: self._http.get(f"/documents/documents/{document_id}"))
+
+    def delete_document(self, document_id: str):
+        self._request(lambda: self._http.delete(f"/documents/documents/{document_id}"))
+
+    # -- Queries -------------------------------------------------------------
+
+    def query(self, query: str, image_data: Optional[str] = None) -> Dict[str, Any]:
+        """Ask a question and wait for the whole answer (``answer`` and ``sources``).
+
+        The endpoint takes its arguments as query parameters; use
+        ``stream_query`` for large images.
+        """
+        params = {"query": query}
+        if image_data:
+            params["image_data"] = image_data
+        return self._request(lambda: self._http.post("/documents/query/", params=params))
+
+    def stream_query(self, query: str, image_data: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Ask a question, yielding ``token`` events as the answer is generated, then ``done``."""
+        return self._stream("/documents/query/stream/", {"query": query, "image_data": image_data})
+
+    def iter_answer(self, query: str, image_data: Optional[str] = None) -> Iterator[str]:
+        """Yield just the answer text of ``stream_query``."""
+        for event in self.stream_query(query, image_data):
+            if event["type"] == "token":
+                yield event["text"]
+
+    def batch_query(self, queries: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        payload = {"queries": queries, "max_concurrency": max_concurrency}
+        return self._request(lambda: self._http.post("/documents/query/batch/", json=payload))["results"]
+
+    def iter_batch_query(self, queries: List[str], max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield batch results as they finish; each carries the ``index`` of its query."""
+        payload = {"queries": queries, "max_concurrency": max_concurrency, "stream": True}
+        return self._stream("/documents/query/batch/", payload)
+
+    # -- Conversations -------------------------------------------------------
+
+    def create_session(self) -> str:
+        return self._request(lambda: self._http.post("/queries/sessions/"))["session_id"]
+
+    def send_message(self, session_id: str, question: str) -> Dict[str, Any]:
+        return self._request(lambda: self._http.post(
+            f"/queries/sessions/{session_id}/messages", json={"question": question}
+        ), retry_errors=UNSENT_ERRORS)  # A processed turn retried would be appended twice
+
+    def delete_session(self, session_id: str):
+        self._request(lambda: self._http.delete(f"/queries/sessions/{session_id}"))
+
+    # -- Internals -----------------------------------------------------------
+
+    def _request(
+        self,
+        send: Callable[[], httpx.Response],
+        retry_statuses=RETRY_STATUSES,
+        retry_errors=(httpx.TransportError,)
+    ) -> Any:
+        """Send with retries; requests that must not run twice pass ``retry_errors=UNSENT_ERRORS``."""
+        attempt = 0
+        while True:
+            try:
+                response = send()
+            except retry_errors:
+                if attempt >= self.retry.max_retries:
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in retry_statuses and attempt < self.retry.max_retries:
+                time.sleep(self.retry.delay(attempt, retry_after_of(response)))
+                attempt += 1
+                continue
+
+            raise_for_status(response)
+            return response.json() if response.content else None
+
+    def _stream(self, path: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """POST and yield NDJSON events; retried only until the first event arrives."""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                with self._http.stream("POST", path, json=payload) as response:
+                    if not response.is_success:
+                        response.read()
+                        raise_for_status(response)
+                    for line in response.iter_lines():
+                        event = parse_event(line)
+                        if event is not None:
+                            started = True
+                            yield event
+                return
+            except (httpx.TransportError, NotebookAPIError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.status_code in RETRY_STATUSES
+                if started or not retryable or attempt >= self.retry.max_retries:
+                    raise
+                time.sleep(self.retry.delay(attempt, getattr(e, "retry_after", None)))
+                attempt += 1
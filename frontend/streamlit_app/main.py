@@ -1,37 +1,46 @@
 import streamlit as st
-import requests
-import json
-from pathlib import Path
 import base64
+import os
 from PIL import Image
 import io
 
+from notebook_llm_client import NotebookAPIError, NotebookClient
+
 # Configure API endpoint
-API_URL = "http://localhost:8000/api/v1"
+API_URL = os.getenv("API_URL", "http://localhost:8000/api/v1")
+
+@st.cache_resource
+def get_client(token: str) -> NotebookClient:
+    """One pooled client per token, shared across reruns and sessions."""
+    return NotebookClient(base_url=API_URL, token=token or None)
 
 def main():
     st.title("Notebook LLM Debug Interface")
     
     # Sidebar for file upload and settings
     with st.sidebar:
-        st.header("Upload Document")
-        uploaded_file = st.file_uploader(
-            "Choose a file",
-            type=["pdf", "docx", "csv", "xlsx", "pptx", "html", "ipynb", "md", "png", "jpg"]
+        token = st.text_input("Access token", value=os.getenv("NOTEBOOK_LLM_TOKEN", ""), type="password")
+        client = get_client(token)
+        
+        st.header("Upload Documents")
+        uploaded_files = st.file_uploader(
+            "Choose files",
+            type=["pdf", "docx", "csv", "xlsx", "pptx", "html", "ipynb", "md", "png", "jpg"],
+            accept_multiple_files=True
         )
         
-        if uploaded_file:
-            if st.button("Process Document"):
-                with st.spinner("Processing document..."):
-                    # Upload document
-                    files = {"file": uploaded_file}
-                    response = requests.post(f"{API_URL}/documents/upload/", files=files)
+        if uploaded_files:
+            if st.button("Process Documents"):
+                with st.spinner(f"Processing {len(uploaded_files)} document(s)..."):
+                    # Uploads run in parallel over the client's connection pool
+                    results = client.upload_many([(f.name, f) for f in uploaded_files])
                     
-                    if response.status_code == 200:
-                        st.success("Document processed successfully!")
-                        st.session_state.document_id = response.json()["document_id"]
+                for result in results:
+                    if result.ok:
+                        st.success(f"{result.filename} processed successfully!")
+                        st.session_state.document_id = result.document_id
                     else:
-                        st.error(f"Error: {response.text}")
+                        st.error(f"{result.filename}: {result.error}")
     
     # Main chat interface
     st.header("Chat Interface")
@@ -61,23 +70,27 @@ def main():
             image.save(buffer, format="JPEG")
             image_data = base64.b64encode(buffer.getvalue()).decode()
         
-        # Send query to API
-        with st.spinner("Thinking..."):
-            response = requests.post(
-                f"{API_URL}/documents/query/",
-                json={"query": prompt, "image_data": image_data}
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # Add assistant response to chat history
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": result["answer"],
-                    "sources": result["sources"]
-                })
-            else:
-                st.error(f"Error: {response.text}")
+        # Stream the answer from the API as it is generated
+        sources = []
+        
+        def answer_tokens():
+            for event in client.stream_query(prompt, image_data):
+                if event["type"] == "token":
+                    yield event["text"]
+                elif event["type"] == "done":
+                    sources.extend(event["sources"])
+        
+        try:
+            with st.chat_message("assistant"):
+                answer = st.write_stream(answer_tokens())
+            # Add assistant response to chat history
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "sources": sources
+            })
+        except NotebookAPIError as e:
+            st.error(f"Error: {e.detail}")
     
     # Debug information
     with st.expander("Debug Information"):
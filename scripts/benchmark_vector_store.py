@@ -0,0 +1,147 @@
+"""Benchmark FAISS index types against the current Chroma collection.
+
+Loads every vector from the Chroma ``document_store`` collection (or random
+vectors with --synthetic), builds each FAISS configuration in a temporary
+directory and reports index memory, build time, query latency and recall@k
+against exact brute-force search. The Chroma collection itself is measured
+the same way for comparison.
+
+    cd backend && python ../scripts/benchmark_vector_store.py --k 10 --queries 500
+    cd backend && python ../scripts/benchmark_vector_store.py --synthetic 1000000
+"""
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from app.core.config import settings  # noqa: E402
+from app.services.vector_store import ChromaVectorStore, FaissVectorStore  # noqa: E402
+
+CONFIGS: List[Tuple[str, Dict]] = [
+    ("flat", {"index_type": "flat"}),
+    ("hnsw M=32 ef=128", {"index_type": "hnsw", "hnsw_m": 32, "ef_search": 128}),
+    ("sq8", {"index_type": "sq8"}),
+    ("ivfsq8 nprobe=32", {"index_type": "ivfsq8", "nprobe": 32}),
+    ("ivfpq m=64 nprobe=16", {"index_type": "ivfpq", "pq_m": 64, "nprobe": 16}),
+    ("ivfpq m=64 nprobe=32", {"index_type": "ivfpq", "pq_m": 64, "nprobe": 32}),
+    ("ivfpq m=128 nprobe=32", {"index_type": "ivfpq", "pq_m": 128, "nprobe": 32}),
+]
+
+
+def load_chroma_vectors(store: ChromaVectorStore, page: int = 10_000) -> Tuple[List[str], np.ndarray]:
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    total = store.collection.count()
+    for offset in range(0, total, page):
+        batch = store.collection.get(include=["embeddings"], limit=page, offset=offset)
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+    return ids, np.vstack(vectors) if vectors else np.zeros((0, settings.EMBEDDING_DIM), dtype=np.float32)
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k, used as ground truth."""
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    neighbors = []
+    for start in range(0, len(queries), 64):
+        scores = queries[start:start + 64] @ normalized.T
+        neighbors.append(np.argsort(-scores, axis=1)[:, :k])
+    return np.vstack(neighbors)
+
+
+def measure(store, ids: List[str], queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = store.search([query], k)[0]
+        latencies.append(time.perf_counter() - started)
+        hits += len({chunk_id for chunk_id, _ in results} & {ids[i] for i in expected})
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "recall": hits / (len(queries) * k),
+    }
+
+
+def directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    chroma: Optional[ChromaVectorStore] = None
+    if args.synthetic:
+        ids = [f"synthetic_{i}" for i in range(args.synthetic)]
+        vectors = rng.normal(size=(args.synthetic, settings.EMBEDDING_DIM)).astype(np.float32)
+    else:
+        chroma = ChromaVectorStore()
+        ids, vectors = load_chroma_vectors(chroma)
+    if not len(ids):
+        sys.exit("No vectors to benchmark; index some documents or pass --synthetic N")
+
+    dim = vectors.shape[1]
+    query_rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[query_rows] + rng.normal(scale=args.noise, size=(len(query_rows), dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_neighbors(vectors, queries, args.k)
+    print(f"{len(ids)} vectors x {dim} dims ({vectors.nbytes / 2**20:.0f} MB float32), "
+          f"{len(queries)} queries, k={args.k}\n")
+
+    header = f"{'index':<24} {'memory MB':>10} {'build s':>9} {'p50 ms':>8} {'p99 ms':>8} {'recall@k':>9}"
+    print(header)
+    print("-" * len(header))
+
+    if chroma is not None:
+        stats = measure(chroma, ids, queries, truth, args.k)
+        memory = directory_bytes(Path(settings.VECTOR_STORE_PATH)) / 2**20
+        print(f"{'chroma (current)':<24} {memory:>10.1f} {'-':>9} "
+              f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['recall']:>9.3f}")
+
+    for name, params in CONFIGS:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            store = FaissVectorStore(
+                path=tmp,
+                dim=dim,
+                nlist=args.nlist,
+                rerank_factor=args.rerank_factor,
+                train_min_vectors=len(ids) + 1,  # Train once after the bulk load
+                **params
+            )
+            for start in range(0, len(ids), 50_000):
+                store.add(ids[start:start + 50_000], vectors[start:start + 50_000])
+            if store.index_type in FaissVectorStore.TRAINED_TYPES:
+                store.train(sample_size=args.train_sample)
+            build = time.perf_counter() - started
+
+            stats = measure(store, ids, queries, truth, args.k)
+            memory = store.memory_bytes() / 2**20
+            print(f"{name:<24} {memory:>10.1f} {build:>9.1f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['recall']:>9.3f}")
+
+    print("\nMemory is the resident index size; FAISS raw vectors used for re-scoring "
+          "stay on disk (memory-mapped) and Chroma is measured as its data directory.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled vectors to form queries")
+    parser.add_argument("--nlist", type=int, default=settings.FAISS_NLIST)
+    parser.add_argument("--rerank-factor", type=int, default=settings.FAISS_RERANK_FACTOR)
+    parser.add_argument("--train-sample", type=int, default=None)
+    parser.add_argument("--synthetic", type=int, default=0, help="Benchmark N random vectors instead of Chroma")
+    parser.add_argument("--only", nargs="*", help="Only run configs whose name starts with these prefixes")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
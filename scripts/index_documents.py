@@ -0,0 +1,47 @@
+"""Bulk-upload a directory of documents through the API.
+
+    python scripts/index_documents.py ./papers --token <jwt> --concurrency 8
+
+Requires the client package (``pip install -e client``).
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from notebook_llm_client import NotebookClient, UploadResult
+
+EXTENSIONS = {
+    ".pdf", ".docx", ".txt", ".md", ".csv", ".xlsx", ".pptx",
+    ".ipynb", ".py", ".png", ".jpg", ".jpeg", ".html"
+}
+
+
+def main(args):
+    paths = sorted(
+        path for path in Path(args.directory).rglob("*")
+        if path.is_file() and path.suffix.lower() in EXTENSIONS
+    )
+    if not paths:
+        sys.exit(f"No supported files under {args.directory}")
+
+    def report(result: UploadResult):
+        status = result.document_id if result.ok else f"FAILED: {result.error}"
+        print(f"{result.filename}: {status}")
+
+    started = time.perf_counter()
+    with NotebookClient(base_url=args.url, token=args.token, max_connections=args.concurrency) as client:
+        results = client.upload_many(paths, max_concurrency=args.concurrency, on_result=report)
+
+    failed = sum(1 for result in results if not result.ok)
+    print(f"\n{len(results) - failed}/{len(results)} uploaded in {time.perf_counter() - started:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--token", required=True, help="JWT access token")
+    parser.add_argument("--concurrency", type=int, default=4)
+    main(parser.parse_args())
@@ -0,0 +1,144 @@
+"""WebSocket load test: how many concurrent connections can one worker hold?
+
+Opens connections to the realtime endpoint in steps, keeps each one alive by
+answering heartbeats, and after every step reports how many are still open,
+connect latency and (with --server-pid) the worker's resident memory.
+
+Run against a single uvicorn worker:
+
+    uvicorn app.main:app --workers 1
+    python scripts/ws_load_test.py --token <jwt> --connections 5000 --step 500 \
+        --server-pid $(pgrep -f "uvicorn app.main:app" | head -1)
+
+Raise the open-file limit first (``ulimit -n 65535``) on both sides.
+"""
+from typing import List, Optional
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+class Stats:
+    def __init__(self):
+        self.open = 0
+        self.failed = 0
+        self.dropped = 0
+        self.pings = 0
+        self.connect_times: List[float] = []
+
+
+async def hold_connection(url: str, stats: Stats, stop: asyncio.Event, query_every: float):
+    started = time.perf_counter()
+    try:
+        websocket = await websockets.connect(url, open_timeout=30, max_queue=64)
+    except Exception:
+        stats.failed += 1
+        return
+
+    stats.connect_times.append(time.perf_counter() - started)
+    stats.open += 1
+    try:
+        async def reader():
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message.get("type") == "ping":
+                    stats.pings += 1
+                    await websocket.send(json.dumps({"type": "pong"}))
+
+        async def querier():
+            count = 0
+            while True:
+                await asyncio.sleep(query_every)
+                count += 1
+                await websocket.send(json.dumps({
+                    "type": "query",
+                    "id": f"q{count}",
+                    "query": "What are the key findings?"
+                }))
+
+        tasks = [asyncio.create_task(reader()), asyncio.create_task(stop.wait())]
+        if query_every:
+            tasks.append(asyncio.create_task(querier()))
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if not stop.is_set():
+            stats.dropped += 1
+    except Exception:
+        if not stop.is_set():
+            stats.dropped += 1
+    finally:
+        stats.open -= 1
+        await websocket.close()
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    if pid is None:
+        return None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def main(args):
+    url = f"{args.url}?token={args.token}"
+    stats = Stats()
+    stop = asyncio.Event()
+    tasks = []
+    baseline = rss_mb(args.server_pid)
+
+    print(f"{'target':>8} {'open':>8} {'failed':>8} {'dropped':>8} {'p50 ms':>8} {'p99 ms':>8} {'rss MB':>8}")
+    for target in range(args.step, args.connections + 1, args.step):
+        step_start = len(stats.connect_times)
+        while len(tasks) < target:
+            tasks.append(asyncio.create_task(hold_connection(url, stats, stop, args.query_every)))
+            if len(tasks) % args.batch == 0:
+                await asyncio.sleep(0)
+        await asyncio.sleep(args.hold)
+
+        times = [t * 1000 for t in stats.connect_times[step_start:]]
+        rss = rss_mb(args.server_pid)
+        print(
+            f"{target:>8} {stats.open:>8} {stats.failed:>8} {stats.dropped:>8} "
+            f"{percentile(times, 0.5):>8.1f} {percentile(times, 0.99):>8.1f} "
+            f"{rss if rss is not None else float('nan'):>8.1f}"
+        )
+        if stats.failed + stats.dropped > target * args.max_error_rate:
+            print(f"Stopping: error rate above {args.max_error_rate:.0%}")
+            break
+
+    print(f"\nMax concurrent open connections: {stats.open}")
+    if baseline is not None and stats.open:
+        print(f"Worker memory per connection: {(rss_mb(args.server_pid) - baseline) * 1024 / stats.open:.1f} KB")
+    if stats.connect_times:
+        print(f"Mean connect latency: {statistics.mean(stats.connect_times) * 1000:.1f} ms")
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/api/v1/ws/")
+    parser.add_argument("--token", required=True, help="JWT access token")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--step", type=int, default=250)
+    parser.add_argument("--batch", type=int, default=50, help="Connections opened per event-loop tick")
+    parser.add_argument("--hold", type=float, default=30.0, help="Seconds to hold each step (covers heartbeats)")
+    parser.add_argument("--query-every", type=float, default=0.0, help="Seconds between streamed queries per connection (0 = idle)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--server-pid", type=int, default=None)
+    asyncio.run(main(parser.parse_args()))